@@ -0,0 +1,319 @@
+import json
+from datetime import datetime
+
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+
+from db import get_db
+
+api = Blueprint("api", __name__, url_prefix="/api")
+
+BATCH_SIZE = 1000   # rows per executemany call
+CHUNK_SIZE = 65536  # bytes per streamed export chunk
+PAGE_SIZE = 100
+
+class ApiError(Exception):
+    pass
+
+@api.errorhandler(ApiError)
+def api_error(error):
+    # Nothing from a failed batch is kept: the open transaction is rolled back on teardown
+    return jsonify(status="error", message=str(error)), 400
+
+
+# ----------------------------
+# BATCHED WRITES
+# ----------------------------
+class BatchWriter:
+    """Buffers rows per table and writes them with executemany, parents before children.
+
+    Ids are allocated up front while the write lock is held, so records later in a
+    batch can refer to rows created earlier in the same batch.
+    """
+    INSERTS = {
+        "projects": "INSERT INTO projects (id, name, deadline) VALUES (?, ?, ?)",
+        "members": "INSERT INTO members (id, name, project_id) VALUES (?, ?, ?)",
+        "modules": "INSERT INTO modules (id, name, project_id, assigned_member_id, priority, completed, weight) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        "module_updates": "INSERT INTO module_updates (module_id, update_date, update_text) VALUES (?, ?, ?)",
+    }
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.conn.execute("BEGIN IMMEDIATE")
+        self.rows = {table: [] for table in self.INSERTS}
+        self.counts = dict.fromkeys(self.INSERTS, 0)
+        self.next_ids = {}
+
+    def allocate(self, table):
+        if table not in self.next_ids:
+            # Stay above sqlite_sequence so AUTOINCREMENT never hands out a deleted row's id
+            last = self.conn.execute(f"""
+                SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = ?), 0),
+                           COALESCE((SELECT MAX(id) FROM {table}), 0))
+            """, (table,)).fetchone()[0]
+            self.next_ids[table] = last + 1
+        new_id = self.next_ids[table]
+        self.next_ids[table] += 1
+        return new_id
+
+    def add(self, table, row):
+        self.rows[table].append(row)
+        self.counts[table] += 1
+        if len(self.rows[table]) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        # INSERTS is in dependency order, so foreign keys always point at rows already written
+        for table, sql in self.INSERTS.items():
+            if self.rows[table]:
+                self.conn.executemany(sql, self.rows[table])
+                self.rows[table].clear()
+
+    def commit(self):
+        self.flush()
+        self.conn.commit()
+
+
+def read_records():
+    """Yield JSON objects from an NDJSON body, a JSON array or a single JSON object."""
+    if request.mimetype in ("application/x-ndjson", "application/jsonl"):
+        for number, line in enumerate(request.stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                raise ApiError(f"Line {number} is not valid JSON")
+            yield check_record(record, number)
+        return
+    body = request.get_json(silent=True)
+    if body is None:
+        raise ApiError("Expected a JSON or NDJSON request body")
+    for number, record in enumerate(body if isinstance(body, list) else [body], start=1):
+        yield check_record(record, number)
+
+def check_record(record, number):
+    if not isinstance(record, dict):
+        raise ApiError(f"Record {number} is not a JSON object")
+    record["_number"] = number
+    return record
+
+def required(record, *keys):
+    for key in keys:
+        if record.get(key) not in (None, ""):
+            return record[key]
+    raise ApiError(f"Record {record['_number']} is missing '{keys[0]}'")
+
+def priority_of(record):
+    priority = record.get("priority") or "Medium"
+    if priority not in ("High", "Medium", "Low"):
+        raise ApiError(f"Record {record['_number']} has unknown priority '{priority}'")
+    return priority
+
+def weight_of(record):
+    weight = record.get("weight")
+    if weight is None:
+        return 1
+    if isinstance(weight, bool) or not isinstance(weight, int) or weight < 1:
+        raise ApiError(f"Record {record['_number']} has an invalid weight (expected a positive integer)")
+    return weight
+
+def created(batch, table, noun, ids=None, verb="created"):
+    count = batch.counts[table]
+    message = f"{noun.capitalize()} {verb} successfully" if count == 1 else f"{count} {noun}s {verb} successfully"
+    body = {"status": "success", "message": message}
+    if ids is not None:
+        body["ids"] = ids
+    return jsonify(body), 201
+
+
+# ----------------------------
+# PROJECTS, MODULES, UPDATES
+# ----------------------------
+@api.route("/projects")
+def list_projects():
+    after = request.args.get("after", 0, type=int)
+    # Clamped both ways: SQLite reads a negative LIMIT as "no limit"
+    limit = max(1, min(request.args.get("limit", PAGE_SIZE, type=int), PAGE_SIZE))
+    projects = get_db().execute("""
+        SELECT id, name, deadline,
+               CASE WHEN total_modules > 0 THEN completed_modules * 100 / total_modules ELSE 0 END AS progress
+        FROM projects WHERE id > ? ORDER BY id LIMIT ?
+    """, (after, limit + 1)).fetchall()
+    data = [{"project_id": p['id'], "project_name": p['name'], "deadline": p['deadline'], "progress": p['progress']}
+            for p in projects[:limit]]
+    # One extra row tells us whether another page exists
+    next_after = data[-1]["project_id"] if len(projects) > limit else None
+    return jsonify(status="success", data=data, next_after=next_after)
+
+@api.route("/projects", methods=["POST"])
+def create_projects():
+    batch = BatchWriter(get_db(write=True))
+    ids = []
+    for record in read_records():
+        project_id = batch.allocate("projects")
+        batch.add("projects", (project_id, required(record, "project_name", "name"), record.get("deadline")))
+        ids.append(project_id)
+    batch.commit()
+    return created(batch, "projects", "project", ids)
+
+@api.route("/projects/<int:project_id>/members", methods=["POST"])
+def create_members(project_id):
+    conn = get_db(write=True)
+    if conn.execute("SELECT 1 FROM projects WHERE id = ?", (project_id,)).fetchone() is None:
+        return jsonify(status="error", message="Project not found"), 404
+    batch = BatchWriter(conn)
+    ids = []
+    for record in read_records():
+        member_id = batch.allocate("members")
+        batch.add("members", (member_id, required(record, "member_name", "name"), project_id))
+        ids.append(member_id)
+    batch.commit()
+    return created(batch, "members", "member", ids)
+
+@api.route("/projects/<int:project_id>/modules", methods=["POST"])
+def create_modules(project_id):
+    conn = get_db(write=True)
+    if conn.execute("SELECT 1 FROM projects WHERE id = ?", (project_id,)).fetchone() is None:
+        return jsonify(status="error", message="Project not found"), 404
+    batch = BatchWriter(conn)
+    # Modules may name their lead (as the README documents) or give the member id
+    member_ids = {}
+    for member in conn.execute("SELECT id, name FROM members WHERE project_id = ?", (project_id,)):
+        member_ids[member['id']] = member['id']
+        member_ids.setdefault(member['name'], member['id'])
+    ids = []
+    for record in read_records():
+        assigned = record.get("assigned_member")
+        if assigned is not None and assigned not in member_ids:
+            raise ApiError(f"Record {record['_number']} is assigned to unknown member '{assigned}'")
+        module_id = batch.allocate("modules")
+        batch.add("modules", (module_id, required(record, "module_name", "name"), project_id,
+                              member_ids.get(assigned), priority_of(record), int(bool(record.get("completed"))),
+                              weight_of(record)))
+        ids.append(module_id)
+    batch.commit()
+    return created(batch, "modules", "module", ids, verb="added")  # the README's documented message
+
+@api.route("/modules/<int:module_id>/update", methods=["POST"])
+def create_updates(module_id):
+    conn = get_db(write=True)
+    if conn.execute("SELECT 1 FROM modules WHERE id = ?", (module_id,)).fetchone() is None:
+        return jsonify(status="error", message="Module not found"), 404
+    batch = BatchWriter(conn)
+    today = datetime.now().date().isoformat()
+    completed = False
+    for record in read_records():
+        batch.add("module_updates", (module_id, record.get("update_date") or today,
+                                     required(record, "update_note", "update_text")))
+        try:
+            percentage = float(record.get("progress_percentage") or 0)
+        except (TypeError, ValueError):
+            raise ApiError(f"Record {record['_number']} has a non-numeric progress_percentage")
+        completed = completed or percentage >= 100
+    batch.flush()
+    if completed:
+        conn.execute("UPDATE modules SET completed = 1 WHERE id = ?", (module_id,))
+    batch.commit()
+    count = batch.counts["module_updates"]
+    message = "Contribution updated successfully" if count == 1 else f"{count} contributions updated successfully"
+    return jsonify(status="success", message=message), 201
+
+
+# ----------------------------
+# BULK IMPORT / EXPORT
+# ----------------------------
+# Both use the same NDJSON record format, one object per line:
+#   {"type": "project", "ref": "p1", "name": "...", "deadline": "YYYY-MM-DD"}
+#   {"type": "member",  "ref": "m1", "project": "p1", "name": "..."}
+#   {"type": "module",  "ref": "t1", "project": "p1", "assigned_member": "m1", "name": "...", "priority": "High", "completed": 0, "weight": 1}
+#   {"type": "update",  "module": "t1", "update_date": "YYYY-MM-DD", "update_text": "..."}
+# "ref" values only need to be unique per type within one import; export uses row ids.
+IMPORT_TABLES = {"project": "projects", "member": "members", "module": "modules"}
+
+def resolve(refs, kind, record, key, optional=False):
+    ref = record.get(key)
+    if ref is None and optional:
+        return None
+    if str(ref) not in refs[kind]:
+        raise ApiError(f"Record {record['_number']} refers to unknown {kind} '{ref}'")
+    return refs[kind][str(ref)]
+
+@api.route("/import", methods=["POST"])
+def import_records():
+    batch = BatchWriter(get_db(write=True))
+    refs = {kind: {} for kind in IMPORT_TABLES}
+    for record in read_records():
+        kind = record.get("type")
+        if kind in IMPORT_TABLES:
+            new_id = batch.allocate(IMPORT_TABLES[kind])
+            refs[kind][str(record.get("ref", f"#{record['_number']}"))] = new_id
+        if kind == "project":
+            batch.add("projects", (new_id, required(record, "name"), record.get("deadline")))
+        elif kind == "member":
+            batch.add("members", (new_id, required(record, "name"), resolve(refs, "project", record, "project")))
+        elif kind == "module":
+            batch.add("modules", (new_id, required(record, "name"), resolve(refs, "project", record, "project"),
+                                  resolve(refs, "member", record, "assigned_member", optional=True),
+                                  priority_of(record), int(bool(record.get("completed"))), weight_of(record)))
+        elif kind == "update":
+            batch.add("module_updates", (resolve(refs, "module", record, "module"),
+                                         record.get("update_date"), required(record, "update_text")))
+        else:
+            raise ApiError(f"Record {record['_number']} has unknown type '{kind}'")
+    batch.commit()
+    return jsonify(status="success", message="Import completed successfully",
+                   created=batch.counts, ids=refs), 201
+
+def export_lines(conn, projects):
+    """Yield the NDJSON lines for each project's graph, straight off the cursors."""
+    for project in projects:
+        yield json.dumps({"type": "project", "ref": project['id'], "name": project['name'],
+                          "deadline": project['deadline']})
+        for member in conn.execute("SELECT id, name FROM members WHERE project_id = ? ORDER BY id", (project['id'],)):
+            yield json.dumps({"type": "member", "ref": member['id'], "project": project['id'], "name": member['name']})
+        for module in conn.execute("""
+            SELECT id, name, assigned_member_id, priority, completed, weight
+            FROM modules WHERE project_id = ? ORDER BY id
+        """, (project['id'],)):
+            yield json.dumps({"type": "module", "ref": module['id'], "project": project['id'],
+                              "assigned_member": module['assigned_member_id'], "name": module['name'],
+                              "priority": module['priority'], "completed": module['completed'],
+                              "weight": module['weight']})
+        for update in conn.execute("""
+            SELECT u.module_id, u.update_date, u.update_text
+            FROM modules m JOIN module_updates u ON u.module_id = m.id
+            WHERE m.project_id = ?
+            ORDER BY m.id, u.update_date, u.id
+        """, (project['id'],)):
+            yield json.dumps({"type": "update", "module": update['module_id'],
+                              "update_date": update['update_date'], "update_text": update['update_text']})
+
+def ndjson_response(conn, projects):
+    def generate():
+        # One read transaction, so the export is a consistent snapshot however long it streams
+        conn.execute("BEGIN")
+        try:
+            chunk, size = [], 0
+            for line in export_lines(conn, projects()):
+                chunk.append(line + "\n")
+                size += len(line) + 1
+                if size >= CHUNK_SIZE:
+                    yield "".join(chunk)
+                    chunk, size = [], 0
+            if chunk:
+                yield "".join(chunk)
+        finally:
+            conn.rollback()
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+@api.route("/projects/<int:project_id>/export")
+def export_project(project_id):
+    conn = get_db()
+    if conn.execute("SELECT 1 FROM projects WHERE id = ?", (project_id,)).fetchone() is None:
+        return jsonify(status="error", message="Project not found"), 404
+    return ndjson_response(conn, lambda: conn.execute("SELECT * FROM projects WHERE id = ?", (project_id,)))
+
+@api.route("/export")
+def export_all():
+    conn = get_db()
+    return ndjson_response(conn, lambda: conn.execute("SELECT * FROM projects ORDER BY id"))
@@ -1,115 +1,171 @@
-from flask import Flask, render_template, request, redirect, url_for
-import sqlite3
-from datetime import datetime
-import os
-# Get the absolute path to the directory this file is in
-BASE_DIR = os.path.abspath(os.path.dirname(__file__))
-DB_PATH = os.path.join(BASE_DIR, "fairshare.db")
-
-def get_db_connection():
-    conn = sqlite3.connect(DB_PATH, timeout=30) # Use the absolute path
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA journal_mode=WAL")
-    return conn
+from flask import Flask, render_template, stream_template, request, redirect, url_for
+from datetime import datetime, timedelta
+from itertools import groupby
+
+import cache
+import db
+import metrics
+import migrations
+import rollups
+from api import api
+from db import get_db
+from search import search
 
 app = Flask(__name__)
+db.init_app(app)
+metrics.init_app(app)
+app.register_blueprint(api)
+app.register_blueprint(search)
 
 # ----------------------------
-# DATABASE CONNECTION
+# DATABASE MIGRATIONS
 # ----------------------------
-def get_db_connection():
-    conn = sqlite3.connect("fairshare.db", timeout=30)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA journal_mode=WAL")
-    return conn
+# Run once per deploy (gunicorn does it in the master via gunicorn_config.py),
+# never on import, so workers don't contend for the write lock at startup.
+@app.cli.command("migrate")
+def migrate_command():
+    """Apply pending schema migrations."""
+    print(f"Database schema at version {migrations.migrate_db()}")
 
-# ----------------------------
-# DATABASE INITIALIZATION & MIGRATION
-# ----------------------------
-def init_db():
-    conn = get_db_connection()
-    c = conn.cursor()
-    # Create Tables
-    c.execute("CREATE TABLE IF NOT EXISTS projects (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, deadline TEXT)")
-    c.execute("CREATE TABLE IF NOT EXISTS members (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, project_id INTEGER, FOREIGN KEY (project_id) REFERENCES projects(id) ON DELETE CASCADE)")
-    c.execute("CREATE TABLE IF NOT EXISTS modules (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, project_id INTEGER, assigned_member_id INTEGER, completed INTEGER DEFAULT 0, FOREIGN KEY (project_id) REFERENCES projects(id) ON DELETE CASCADE, FOREIGN KEY (assigned_member_id) REFERENCES members(id))")
-    c.execute("CREATE TABLE IF NOT EXISTS module_updates (id INTEGER PRIMARY KEY AUTOINCREMENT, module_id INTEGER, update_date TEXT, update_text TEXT, FOREIGN KEY (module_id) REFERENCES modules(id) ON DELETE CASCADE)")
-    
-    # Migration: Add priority column if it doesn't exist
+@app.cli.command("rebuild-search")
+def rebuild_search_command():
+    """Rebuild the full-text search index from module_updates."""
+    conn = db.connect()
     try:
-        c.execute("ALTER TABLE modules ADD COLUMN priority TEXT DEFAULT 'Medium'")
-    except sqlite3.OperationalError:
-        pass # Column already exists
-        
-    conn.commit()
-    conn.close()
+        conn.execute("BEGIN IMMEDIATE")
+        migrations.rebuild_update_search(conn)
+        conn.commit()
+    finally:
+        conn.close()
+    print("Search index rebuilt")
+
+@app.cli.command("rebuild-rollups")
+def rebuild_rollups_command():
+    """Recompute the member contribution rollups from scratch."""
+    conn = db.connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        rollups.rebuild(conn)
+        # Reports show the rollups, so cached pages built from the old figures must go
+        conn.execute("UPDATE change_versions SET version = version + 1")
+        conn.commit()
+    finally:
+        conn.close()
+    print("Contribution rollups rebuilt")
+
+@app.cli.command("verify-rollups")
+def verify_rollups_command():
+    """Check the member contribution rollups against a full recount."""
+    conn = db.connect(readonly=True)
+    try:
+        conn.execute("BEGIN")
+        mismatched = rollups.verify(conn)
+    finally:
+        conn.close()
+    if mismatched:
+        print(f"Rollups out of date for member ids: {', '.join(map(str, mismatched))}")
+        print("Run 'flask rebuild-rollups' to repair them")
+        raise SystemExit(1)
+    print("Contribution rollups match")
 
-init_db()
+@app.cli.command("clear-page-cache")
+def clear_page_cache_command():
+    """Drop every cached page (needed after restoring or replacing the database file)."""
+    cache.clear()
+    print("Page cache cleared")
 
 # ----------------------------
 # ROUTES
 # ----------------------------
 
+# Dashboard filters: each maps to a WHERE clause over the maintained counters.
+# ":today" is bound from Python so "today" follows the server's local date.
+DONE_SQL = "(total_modules > 0 AND completed_modules = total_modules)"
+DATED_SQL = "deadline GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'"
+STATUS_FILTERS = {
+    "overdue": f"NOT {DONE_SQL} AND {DATED_SQL} AND deadline < :today",
+    "today": f"NOT {DONE_SQL} AND deadline = :today",
+    "done": DONE_SQL,
+}
+PAGE_SIZE = 50
+
+def dashboard_sql(status=None, search=False):
+    """The dashboard's page query, optionally narrowed by one of STATUS_FILTERS and a name search (:q)."""
+    # One query per page: progress comes from the counters, the countdown from julianday().
+    # Keyset pagination on id keeps the cost of a page flat however many projects exist.
+    where = "id > :after"
+    if status:
+        where += " AND " + STATUS_FILTERS[status]
+    if search:
+        where += " AND name LIKE :q ESCAPE '\\'"
+    return f"""
+        SELECT id, name, deadline,
+               CASE WHEN total_modules > 0 THEN completed_modules * 100 / total_modules ELSE 0 END AS progress,
+               CASE WHEN {DATED_SQL}
+                    THEN CAST(julianday(deadline) - julianday(:today) AS INTEGER) END AS delta
+        FROM projects
+        WHERE {where}
+        ORDER BY id
+        LIMIT :limit
+    """
+
 @app.route("/")
+@cache.cached_page("dashboard", daily=True)
 def home():
-    conn = get_db_connection()
-    projects = conn.execute("SELECT * FROM projects").fetchall()
-    
+    status = request.args.get("status")
+    if status not in STATUS_FILTERS:
+        status = None
+    after = request.args.get("after", 0, type=int)
+    q = request.args.get("q", "").strip()
+    today = datetime.now().date().isoformat()
+
+    # The name search runs in the same keyset query, so it covers every page, not just this one
+    pattern = "%" + q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    conn = get_db()
+    projects = conn.execute(dashboard_sql(status, search=bool(q)),
+                            {"after": after, "today": today, "q": pattern, "limit": PAGE_SIZE + 1}).fetchall()
+
+    next_after = projects[PAGE_SIZE - 1]['id'] if len(projects) > PAGE_SIZE else None
     projects_with_info = []
-    for project in projects:
+    for project in projects[:PAGE_SIZE]:
         p_dict = dict(project)
-        
+        delta = p_dict.pop('delta')
+
         # --- COUNTDOWN LOGIC ---
-        try:
-            # Convert string date from DB to Python date object
-            deadline_date = datetime.strptime(project['deadline'], '%Y-%m-%d').date()
-            today = datetime.now().date()
-            delta = (deadline_date - today).days
-            
-            if delta < 0:
-                p_dict['days_left'] = "Overdue"
-                p_dict['urgency'] = "high" # For CSS coloring
-            elif delta == 0:
-                p_dict['days_left'] = "Due Today"
-                p_dict['urgency'] = "high"
-            else:
-                p_dict['days_left'] = f"{delta} days left"
-                p_dict['urgency'] = "normal"
-        except (ValueError, TypeError):
+        if delta is None:
             p_dict['days_left'] = "No Date Set"
             p_dict['urgency'] = "none"
+        elif delta < 0:
+            p_dict['days_left'] = "Overdue"
+            p_dict['urgency'] = "high" # For CSS coloring
+        elif delta == 0:
+            p_dict['days_left'] = "Due Today"
+            p_dict['urgency'] = "high"
+        else:
+            p_dict['days_left'] = f"{delta} days left"
+            p_dict['urgency'] = "normal"
 
-        # --- PROGRESS LOGIC ---
-        modules = conn.execute("SELECT completed FROM modules WHERE project_id = ?", (project['id'],)).fetchall()
-        total = len(modules)
-        completed = sum(1 for m in modules if m['completed'])
-        p_dict['progress'] = int((completed / total) * 100) if total > 0 else 0
-        
         projects_with_info.append(p_dict)
-        
-    conn.close()
-    return render_template("index.html", projects=projects_with_info)
+
+    return render_template("index.html", projects=projects_with_info,
+                           status=status, q=q, after=after, next_after=next_after)
 
 @app.route("/create", methods=["GET", "POST"])
 def create():
     if request.method == "POST":
         name = request.form["project_name"]
         deadline = request.form["deadline"]
-        conn = get_db_connection()
+        conn = get_db(write=True)
         conn.execute("INSERT INTO projects (name, deadline) VALUES (?, ?)", (name, deadline))
         conn.commit()
-        conn.close()
         return redirect(url_for('home'))
     return render_template("create_project.html")
 
-@app.route("/project/<int:project_id>")
-def project_modules(project_id):
-    conn = get_db_connection()
-    project = conn.execute("SELECT * FROM projects WHERE id = ?", (project_id,)).fetchone()
-    
-    # Fetch modules with member names and priorities
-   # Change the modules query to this:
-    modules = conn.execute("""
+# Read queries shared by the pages below (tests/test_query_plans.py checks their plans)
+PROJECT_SQL = "SELECT * FROM projects WHERE id = ?"
+PROJECT_MEMBERS_SQL = "SELECT * FROM members WHERE project_id = ?"
+# Task list with member names, highest priority first (idx_modules_project_priority)
+PROJECT_MODULES_SQL = """
     SELECT m.*, mem.name as member_name 
     FROM modules m 
     LEFT JOIN members mem ON m.assigned_member_id = mem.id 
@@ -119,25 +175,32 @@ def project_modules(project_id):
         WHEN 'Medium' THEN 2 
         ELSE 3 
     END, m.completed ASC
-""", (project_id,)).fetchall()
-    
-    members = conn.execute("SELECT * FROM members WHERE project_id = ?", (project_id,)).fetchall()
+"""
+MODULE_SQL = "SELECT * FROM modules WHERE id = ?"
+MEMBER_SQL = "SELECT * FROM members WHERE id = ?"
+MODULE_UPDATES_SQL = "SELECT * FROM module_updates WHERE module_id = ? ORDER BY update_date DESC"
+
+@app.route("/project/<int:project_id>")
+@cache.cached_page("project")
+def project_modules(project_id):
+    conn = get_db()
+    project = conn.execute(PROJECT_SQL, (project_id,)).fetchone()
+    modules = conn.execute(PROJECT_MODULES_SQL, (project_id,)).fetchall()
+    members = conn.execute(PROJECT_MEMBERS_SQL, (project_id,)).fetchall()
     
     # Summary progress for the page header
     total = len(modules)
     completed = sum(1 for m in modules if m['completed'])
     progress = int((completed / total) * 100) if total > 0 else 0
     
-    conn.close()
     return render_template("project_modules.html", project=project, modules=modules, members=members, progress=progress)
 
 @app.route("/project/<int:project_id>/add_member", methods=["POST"])
 def add_member(project_id):
     name = request.form["member_name"]
-    conn = get_db_connection()
+    conn = get_db(write=True)
     conn.execute("INSERT INTO members (name, project_id) VALUES (?, ?)", (name, project_id))
     conn.commit()
-    conn.close()
     return redirect(url_for('project_modules', project_id=project_id))
 
 @app.route("/project/<int:project_id>/add_module", methods=["POST"])
@@ -145,25 +208,25 @@ def add_module(project_id):
     name = request.form["module_name"]
     member_id = request.form["assigned_member"]
     priority = request.form.get("priority", "Medium") # Safeguard with .get()
+    weight = max(request.form.get("weight", 1, type=int), 1)
     
-    conn = get_db_connection()
-    conn.execute("INSERT INTO modules (name, project_id, assigned_member_id, priority) VALUES (?, ?, ?, ?)", 
-                 (name, project_id, member_id, priority))
+    conn = get_db(write=True)
+    conn.execute("INSERT INTO modules (name, project_id, assigned_member_id, priority, weight) VALUES (?, ?, ?, ?, ?)", 
+                 (name, project_id, member_id, priority, weight))
     conn.commit()
-    conn.close()
     return redirect(url_for('project_modules', project_id=project_id))
 
 @app.route("/module/<int:module_id>")
+@cache.cached_page("module")
 def module_members(module_id):
-    conn = get_db_connection()
-    module = conn.execute("SELECT * FROM modules WHERE id = ?", (module_id,)).fetchone()
-    member = conn.execute("SELECT * FROM members WHERE id = ?", (module["assigned_member_id"],)).fetchone()
-    updates = conn.execute("SELECT * FROM module_updates WHERE module_id = ? ORDER BY update_date DESC", (module_id,)).fetchall()
+    conn = get_db()
+    module = conn.execute(MODULE_SQL, (module_id,)).fetchone()
+    member = conn.execute(MEMBER_SQL, (module["assigned_member_id"],)).fetchone()
+    updates = conn.execute(MODULE_UPDATES_SQL, (module_id,)).fetchall()
     
     # NEW: Fetch all members of this project so we can reassign the task
-    all_members = conn.execute("SELECT * FROM members WHERE project_id = ?", (module['project_id'],)).fetchall()
+    all_members = conn.execute(PROJECT_MEMBERS_SQL, (module['project_id'],)).fetchall()
     
-    conn.close()
     return render_template("module_members.html", 
                            module=module, 
                            member=member, 
@@ -173,85 +236,121 @@ def module_members(module_id):
 @app.route("/module/<int:module_id>/add_update", methods=["POST"])
 def add_update(module_id):
     date, text = request.form["update_date"], request.form["update_text"]
-    conn = get_db_connection()
+    conn = get_db(write=True)
     conn.execute("INSERT INTO module_updates (module_id, update_date, update_text) VALUES (?, ?, ?)", (module_id, date, text))
     conn.commit()
-    conn.close()
     return redirect(url_for('module_members', module_id=module_id))
 
 @app.route("/module/<int:module_id>/complete", methods=["POST"])
 def complete_module(module_id):
-    conn = get_db_connection()
+    conn = get_db(write=True)
     conn.execute("UPDATE modules SET completed = 1 WHERE id = ?", (module_id,))
     conn.commit()
-    conn.close()
     return redirect(url_for('module_members', module_id=module_id))
 
 @app.route("/project/<int:project_id>/delete", methods=["POST"])
 def delete_project(project_id):
-    conn = get_db_connection()
+    conn = get_db(write=True)
+    # foreign_keys is on for every connection, so members, tasks and their updates cascade
+    with conn:
+        conn.execute("DELETE FROM projects WHERE id = ?", (project_id,))
+    return redirect(url_for('home'))
+
+REPORT_TIMELINE_SQL = """
+    SELECT m.id AS module_id, m.name, mem.name AS member_name,
+           u.id AS update_id, u.update_date, u.update_text
+    FROM modules m
+    LEFT JOIN members mem ON m.assigned_member_id = mem.id
+    LEFT JOIN module_updates u ON u.module_id = m.id
+    WHERE m.project_id = ?
+    ORDER BY m.id, u.update_date ASC, u.id
+"""
+
+def report_timeline(conn, project_id):
+    """Yield (module, updates) pairs for the report from one ordered join, grouping as the cursor is read."""
+    rows = conn.execute(REPORT_TIMELINE_SQL, (project_id,))
     try:
-        conn.execute("PRAGMA foreign_keys = ON")
-        with conn:
-            conn.execute("DELETE FROM projects WHERE id = ?", (project_id,))
+        for _, group in groupby(rows, key=lambda row: row['module_id']):
+            first = next(group)
+            yield first, module_timeline(first, group)
     finally:
-        conn.close()
-    return redirect(url_for('home'))
+        # Release the read snapshot even if the client disconnects mid-stream
+        rows.close()
+
+def module_timeline(first, rest):
+    # A module without updates comes back as a single LEFT JOIN row with NULL update columns
+    if first['update_id'] is None:
+        return
+    yield first
+    yield from rest
 
 @app.route("/project/<int:project_id>/report")
+@cache.cached_page("project")
 def project_report(project_id):
-    conn = get_db_connection()
-    project = conn.execute("SELECT * FROM projects WHERE id = ?", (project_id,)).fetchone()
-    modules = conn.execute("""
-        SELECT m.*, mem.name as member_name 
-        FROM modules m 
-        LEFT JOIN members mem ON m.assigned_member_id = mem.id 
-        WHERE m.project_id = ?
-    """, (project_id,)).fetchall()
-    
-    total_tasks = len(modules)
-    completed_tasks = sum(1 for m in modules if m['completed'])
+    conn = get_db()
+    project = conn.execute(PROJECT_SQL, (project_id,)).fetchone()
+
+    # Header figures come from the maintained counters, so nothing has to be read ahead of the timeline
+    total_tasks = project['total_modules'] if project else 0
+    completed_tasks = project['completed_modules'] if project else 0
     progress = int((completed_tasks / total_tasks) * 100) if total_tasks > 0 else 0
 
-    updates = {}
-    for m in modules:
-        m_updates = conn.execute("SELECT * FROM module_updates WHERE module_id = ? ORDER BY update_date ASC", (m['id'],)).fetchall()
-        updates[m['id']] = m_updates
-        
-    conn.close()
-    return render_template("final_report.html", 
-                           project=project, 
-                           modules=modules, 
-                           updates=updates, 
+    # Streamed: the page is sent while the timeline cursor is still being read
+    return stream_template("final_report.html",
+                           project=project,
+                           contributions=rollups.member_contributions(conn, project_id),
+                           timeline=report_timeline(conn, project_id),
                            progress=progress,
                            total=total_tasks,
                            completed=completed_tasks)
+
+ACTIVITY_WEEKS = 12
+
+@app.route("/project/<int:project_id>/contributions")
+def member_contributions(project_id):
+    conn = get_db()
+    project = conn.execute("SELECT * FROM projects WHERE id = ?", (project_id,)).fetchone()
+    if project is None:
+        return redirect(url_for('home'))
+
+    # Week labels in SQLite's strftime('%Y-W%W') form; a week spanning New Year gets both halves
+    today = datetime.now().date()
+    weeks = sorted({(today - timedelta(days=day)).strftime("%Y-W%W") for day in range(ACTIVITY_WEEKS * 7)})
+
+    # Both reads come from the rollup tables: one row per member plus one per active week
+    contributions = rollups.member_contributions(conn, project_id)
+    activity = rollups.member_activity(conn, project_id, "week", weeks[0])
+    busiest = max((n for buckets in activity.values() for n in buckets.values()), default=0)
+    return render_template("contributions.html", project=project, contributions=contributions,
+                           weeks=weeks, activity=activity, busiest=busiest)
+
 @app.route("/module/<int:module_id>/edit", methods=["POST"])
 def edit_module(module_id):
     name = request.form["module_name"]
     member_id = request.form["assigned_member"]
     priority = request.form["priority"]
+    weight = request.form.get("weight", type=int)
+    if weight is not None and weight < 1:
+        weight = None
     
-    conn = get_db_connection()
+    conn = get_db(write=True)
+    # Reassigning moves the task's counts and activity to the new lead (see rollups.py)
     conn.execute("""
         UPDATE modules 
-        SET name = ?, assigned_member_id = ?, priority = ? 
+        SET name = ?, assigned_member_id = ?, priority = ?, weight = COALESCE(?, weight) 
         WHERE id = ?
-    """, (name, member_id, priority, module_id))
+    """, (name, member_id, priority, weight, module_id))
     conn.commit()
-    conn.close()
     return redirect(url_for('module_members', module_id=module_id))
 @app.route("/project/<int:project_id>/delete_task/<int:module_id>", methods=["POST"])
 def delete_task(project_id, module_id):
-    conn = get_db_connection()
-    try:
-        # PRAGMA ensures that if you delete a task, its updates go with it
-        conn.execute("PRAGMA foreign_keys = ON")
-        conn.execute("DELETE FROM modules WHERE id = ?", (module_id,))
-        conn.commit()
-    finally:
-        conn.close()
+    conn = get_db(write=True)
+    # foreign_keys is on for every connection, so the task's updates go with it
+    conn.execute("DELETE FROM modules WHERE id = ?", (module_id,))
+    conn.commit()
     return redirect(url_for('project_modules', project_id=project_id))
 
 if __name__ == "__main__":
+    migrations.migrate_db()
+    cache.clear()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,325 @@
+import argparse
+import json
+import os
+import resource
+import sqlite3
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# ----------------------------
+# ROUTE BENCHMARKS
+# ----------------------------
+# Drives every route in app.py, either in-process through the Flask test client
+# (which also counts SQL statements) or over HTTP against a running server, e.g.
+#   gunicorn -c gunicorn_config.py -w 4 app:app
+#
+#   FAIRSHARE_DB=/tmp/bench.db python seed.py --projects 100000 --modules 1000000 --updates 10000000
+#   FAIRSHARE_DB=/tmp/bench.db python bench.py --save baseline.json
+#   FAIRSHARE_DB=/tmp/bench.db python bench.py --compare baseline.json
+#
+# Write routes modify the database, so point FAIRSHARE_DB at a scratch copy.
+# In-process runs turn the page cache off (FAIRSHARE_PAGE_CACHE_MB=0) so every read is
+# rendered; --page-cache keeps it on. Over HTTP the server's own setting applies.
+# Peak RSS is the benchmark process's own in-process; over HTTP it is the server's
+# (--server-pid $(cat gunicorn.pid), read from /proc) or null without it.
+
+def pick_targets(db_path):
+    """Choose the ids to hit: the biggest project (worst case) and a typical one."""
+    conn = sqlite3.connect(db_path)
+    biggest = conn.execute("SELECT id FROM projects ORDER BY total_modules DESC LIMIT 1").fetchone()
+    typical = conn.execute("""
+        SELECT id FROM projects WHERE total_modules > 0
+        ORDER BY total_modules LIMIT 1 OFFSET (SELECT COUNT(*) / 2 FROM projects WHERE total_modules > 0)
+    """).fetchone()
+    if biggest is None or typical is None:
+        sys.exit("The database has no tasks to benchmark; generate some with seed.py first.")
+    module = conn.execute("SELECT id, assigned_member_id FROM modules WHERE project_id = ? LIMIT 1", typical).fetchone()
+    conn.close()
+    return {"big_project": biggest[0], "project": typical[0], "module": module[0], "member": module[1]}
+
+def read_routes(t):
+    return {
+        "home": "/",
+        "home_overdue": "/?status=overdue",
+        "project_modules": f"/project/{t['project']}",
+        "project_modules_big": f"/project/{t['big_project']}",
+        "module_members": f"/module/{t['module']}",
+        "project_report": f"/project/{t['project']}/report",
+        "project_report_big": f"/project/{t['big_project']}/report",
+    }
+
+def write_routes(t, db_path):
+    """Map each write route to a function building iteration n's request (names vary so runs don't collide)."""
+    def scratch(sql, params):
+        # Rows for the delete routes are made outside the timed request
+        conn = sqlite3.connect(db_path)
+        with conn:
+            row_id = conn.execute(sql, params).lastrowid
+        conn.close()
+        return row_id
+
+    member = str(t['member'])
+    return {
+        "create": lambda n: ("/create", {"project_name": f"Bench {n}", "deadline": "2030-01-01"}),
+        "add_member": lambda n: (f"/project/{t['project']}/add_member", {"member_name": f"Bench {n}"}),
+        "add_module": lambda n: (f"/project/{t['project']}/add_module",
+                                 {"module_name": f"Bench {n}", "assigned_member": member, "priority": "High"}),
+        "add_update": lambda n: (f"/module/{t['module']}/add_update",
+                                 {"update_date": "2030-01-01", "update_text": f"Bench {n}"}),
+        "edit_module": lambda n: (f"/module/{t['module']}/edit",
+                                  {"module_name": f"Bench {n}", "assigned_member": member, "priority": "Medium"}),
+        "complete_module": lambda n: (f"/module/{t['module']}/complete", {}),
+        "delete_task": lambda n: (f"/project/{t['project']}/delete_task/" + str(scratch(
+            "INSERT INTO modules (name, project_id, assigned_member_id) VALUES (?, ?, ?)",
+            (f"Bench {n}", t['project'], t['member']))), {}),
+        "delete_project": lambda n: (f"/project/{scratch('INSERT INTO projects (name) VALUES (?)', (f'Bench {n}',))}/delete", {}),
+    }
+
+
+class ClientDriver:
+    """Runs requests in-process and counts the SQL statements each one executes."""
+
+    def __init__(self):
+        import app
+        import db
+        self.client = app.app.test_client()
+        self.statements = 0
+        # Trigger bodies are traced as "-- TRIGGER" lines; count only top-level statements
+        db.CONNECT_HOOKS.append(lambda conn: conn.set_trace_callback(self.trace))
+
+    def peak_rss_kb(self):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    def trace(self, statement):
+        if not statement.startswith("--"):
+            self.statements += 1
+
+    def request(self, path, form=None):
+        before = self.statements
+        start = time.perf_counter()
+        response = self.client.post(path, data=form) if form is not None else self.client.get(path)
+        response.data  # drain streamed bodies
+        response.close()
+        elapsed = time.perf_counter() - start
+        if response.status_code >= 400:
+            raise RuntimeError(f"{path} returned {response.status_code}")
+        return elapsed, self.statements - before
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+class HttpDriver:
+    """Runs requests over HTTP; SQL statement counts are not visible from outside the server."""
+
+    def __init__(self, url, server_pid=None):
+        self.url = url.rstrip("/")
+        self.server_pid = server_pid
+        self.opener = urllib.request.build_opener(NoRedirect)
+
+    def peak_rss_kb(self):
+        # The server's memory, not ours: the gunicorn master plus its workers, each at its own
+        # high-water mark (so a slight overestimate of their combined peak). None without --server-pid.
+        if self.server_pid is None:
+            return None
+        pids = [self.server_pid] + child_pids(self.server_pid)
+        return sum(vm_hwm_kb(pid) or 0 for pid in pids)
+
+    def request(self, path, form=None):
+        data = urllib.parse.urlencode(form).encode() if form is not None else None
+        start = time.perf_counter()
+        try:
+            with self.opener.open(self.url + path, data=data) as response:
+                response.read()
+        except urllib.error.HTTPError as error:
+            if error.code >= 400:
+                raise RuntimeError(f"{path} returned {error.code}")
+        return time.perf_counter() - start, None
+
+
+def child_pids(parent):
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may hold spaces; ppid is the second field after its closing paren
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue  # exited while we were looking
+        if int(fields[1]) == parent:
+            children.append(int(entry))
+    return children
+
+def vm_hwm_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def run_route(driver, make_request, requests, concurrency, warmup):
+    for n in range(warmup):
+        driver.request(*make_request(n))
+    peak_before = driver.peak_rss_kb()
+    lock = threading.Lock()
+    samples, statements = [], []
+
+    def one(n):
+        elapsed, count = driver.request(*make_request(warmup + n))
+        with lock:
+            samples.append(elapsed)
+            if count is not None:
+                statements.append(count)
+
+    start = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(concurrency) as pool:
+            list(pool.map(one, range(requests)))
+    else:
+        for n in range(requests):
+            one(n)
+    wall = time.perf_counter() - start
+
+    samples.sort()
+    return {
+        "requests": requests,
+        "p50_ms": round(percentile(samples, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+        "throughput_rps": round(requests / wall, 1),
+        "sql_statements": round(statistics.fmean(statements), 1) if statements else None,
+        "peak_rss_growth_kb": None if peak_before is None else driver.peak_rss_kb() - peak_before,
+    }
+
+def run(args):
+    db_path = os.environ.get("FAIRSHARE_DB")
+    if not db_path:
+        sys.exit("Set FAIRSHARE_DB to a scratch database; the write routes modify it.")
+    targets = pick_targets(db_path)
+    if args.server_pid is not None and not args.url:
+        sys.exit("--server-pid needs --url: in-process runs measure their own memory.")
+    if args.url:
+        if args.server_pid is not None and not os.path.exists(f"/proc/{args.server_pid}/status"):
+            sys.exit(f"--server-pid {args.server_pid}: no such process (or no /proc to read it from)")
+        driver = HttpDriver(args.url, args.server_pid)
+    else:
+        if args.concurrency > 1:
+            sys.exit("--concurrency needs --url: the in-process client is benchmarked serially.")
+        # Repeated requests for one page are cache hits after the first, which would time a lookup
+        # instead of the route; measure rendering unless the cache itself is under test
+        if not args.page_cache:
+            os.environ["FAIRSHARE_PAGE_CACHE_MB"] = "0"
+        driver = ClientDriver()
+
+    results = {}
+    for name, path in read_routes(targets).items():
+        if args.routes and name not in args.routes:
+            continue
+        results[name] = run_route(driver, lambda n, path=path: (path,), args.requests, args.concurrency, args.warmup)
+        print(format_row(name, results[name]))
+    if not args.read_only:
+        for name, make_request in write_routes(targets, db_path).items():
+            if args.routes and name not in args.routes:
+                continue
+            results[name] = run_route(driver, make_request, args.requests, args.concurrency, args.warmup)
+            print(format_row(name, results[name]))
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "mode": args.url or "test-client",
+            # None over HTTP: the server's own FAIRSHARE_PAGE_CACHE_MB decides
+            "page_cache": None if args.url else args.page_cache,
+            "database": db_stats(db_path),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+        },
+        "peak_rss_kb": driver.peak_rss_kb(),
+        "routes": results,
+    }
+
+def db_stats(db_path):
+    conn = sqlite3.connect(db_path)
+    stats = {table: conn.execute(f"SELECT MAX(id) FROM {table}").fetchone()[0] or 0
+             for table in ("projects", "members", "modules", "module_updates")}
+    conn.close()
+    return stats
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def format_row(name, r):
+    sql = "-" if r["sql_statements"] is None else r["sql_statements"]
+    return (f"{name:<22} p50 {r['p50_ms']:>9.2f} ms  p95 {r['p95_ms']:>9.2f} ms  p99 {r['p99_ms']:>9.2f} ms  "
+            f"{r['throughput_rps']:>8.1f} req/s  sql {sql}")
+
+def compare(baseline, current, threshold):
+    """Print p95 changes against a saved baseline. Returns the routes that regressed."""
+    print(f"\nAgainst baseline {baseline['meta']['commit']} ({baseline['meta']['timestamp']}):")
+    if baseline["meta"].get("page_cache") != current["meta"]["page_cache"]:
+        print(f"Warning: page cache {baseline['meta'].get('page_cache')} in the baseline, "
+              f"{current['meta']['page_cache']} now; cached reads are not comparable with rendered ones")
+    regressed = []
+    for name, r in current["routes"].items():
+        old = baseline["routes"].get(name)
+        if old is None:
+            continue
+        change = (r["p95_ms"] - old["p95_ms"]) / old["p95_ms"] if old["p95_ms"] else 0.0
+        flag = "  REGRESSED" if change > threshold else ""
+        print(f"{name:<22} p95 {old['p95_ms']:>9.2f} -> {r['p95_ms']:>9.2f} ms ({change:+.0%})  "
+              f"sql {old['sql_statements']} -> {r['sql_statements']}{flag}")
+        if flag:
+            regressed.append(name)
+    return regressed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the FairShare routes against FAIRSHARE_DB.")
+    parser.add_argument("--url", help="benchmark a running server over HTTP instead of the in-process test client")
+    parser.add_argument("--requests", type=int, default=200, help="timed requests per route")
+    parser.add_argument("--warmup", type=int, default=5, help="untimed requests per route before measuring")
+    parser.add_argument("--concurrency", type=int, default=1, help="parallel HTTP clients (with --url)")
+    parser.add_argument("--routes", nargs="+", help="only run these routes")
+    parser.add_argument("--read-only", action="store_true", help="skip the write routes")
+    parser.add_argument("--server-pid", type=int,
+                        help="with --url, the gunicorn master's pid: report the server's peak RSS (Linux only)")
+    parser.add_argument("--page-cache", action="store_true",
+                        help="leave the page cache on (in-process only; by default reads are rendered every time)")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="compare p95 latencies against this saved JSON baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="p95 slowdown counted as a regression")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            if compare(json.load(f), results, args.threshold):
+                sys.exit(1)
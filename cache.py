@@ -0,0 +1,201 @@
+import functools
+import glob
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from flask import Response, make_response, request
+
+import db
+from db import get_db
+
+# ----------------------------
+# PAGE CACHE
+# ----------------------------
+# Rendered pages are stored against the change counter of the project they show
+# (change_versions, bumped by triggers on every write; row 0 covers the dashboard).
+# A request looks the counter up once: a matching If-None-Match gets a bare 304,
+# a page already rendered at that version is served from the store, and anything
+# else is rendered as usual and stored on the way out. The store is a separate
+# SQLite file, so every gunicorn worker shares it without touching the main
+# database's write lock. Least recently used pages are dropped past MAX_PAGES pages
+# or MAX_BYTES in total; FAIRSHARE_PAGE_CACHE_MB=0 turns the store off (ETags stay).
+CACHE_PATH = os.environ.get("FAIRSHARE_PAGE_CACHE", db.DB_PATH + "-pages")
+MAX_BYTES = int(os.environ.get("FAIRSHARE_PAGE_CACHE_MB", "256")) * 1024 * 1024
+MAX_PAGES = 1000
+MAX_PAGE_BYTES = MAX_BYTES // 4
+TOUCH_SECONDS = 10  # how stale a hit's LRU timestamp may get before it is rewritten
+
+DASHBOARD = 0  # change_versions row for the dashboard; project ids start at 1
+
+VERSION_SQL = {
+    "dashboard": "SELECT version FROM change_versions WHERE project_id = ?",
+    "project": "SELECT version FROM change_versions WHERE project_id = ?",
+    "module": """
+        SELECT v.version FROM modules m JOIN change_versions v ON v.project_id = m.project_id
+        WHERE m.id = ?
+    """,
+}
+SCOPE_ARGS = {"project": "project_id", "module": "module_id"}
+
+log = logging.getLogger("fairshare.cache")
+_local = threading.local()
+
+def code_version():
+    # Pages rendered by older templates or views must never match, so deploys change every ETag
+    digest = hashlib.sha1()
+    for path in sorted(glob.glob(os.path.join(db.BASE_DIR, "*.py")) +
+                       glob.glob(os.path.join(db.BASE_DIR, "templates", "*.html"))):
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:10]
+
+CODE_VERSION = code_version()
+
+
+# ----------------------------
+# SHARED STORE
+# ----------------------------
+def store():
+    # One handle per worker thread, reopened after a fork like db.worker_connection
+    if getattr(_local, "pid", None) != os.getpid():
+        _local.pid = os.getpid()
+        _local.conn = None
+    if _local.conn is None:
+        conn = sqlite3.connect(CACHE_PATH, timeout=1, isolation_level=None)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = OFF")  # a lost page is just re-rendered
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                path TEXT PRIMARY KEY,
+                etag TEXT NOT NULL,
+                mimetype TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                used REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_used ON pages(used)")
+        _local.conn = conn
+    return _local.conn
+
+def lookup(path, etag):
+    """Return (mimetype, body) for a page stored at this ETag, or None."""
+    try:
+        conn = store()
+        row = conn.execute("SELECT mimetype, body, used FROM pages WHERE path = ? AND etag = ?",
+                           (path, etag)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[2] >= TOUCH_SECONDS:
+            conn.execute("UPDATE pages SET used = ? WHERE path = ?", (now, path))
+        return row[0], row[1]
+    except sqlite3.Error:
+        # The cache is best effort: a busy or broken store just means rendering the page
+        log.warning("Page cache lookup failed for %s", path, exc_info=True)
+        return None
+
+def save(path, etag, mimetype, body):
+    try:
+        conn = store()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # One row per URL: a page at a newer version replaces the stale one
+            conn.execute("""
+                INSERT INTO pages (path, etag, mimetype, body, size, used) VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (path) DO UPDATE SET etag = excluded.etag, mimetype = excluded.mimetype,
+                                                 body = excluded.body, size = excluded.size, used = excluded.used
+            """, (path, etag, mimetype, body, len(body), time.time()))
+            conn.execute("""
+                DELETE FROM pages WHERE path IN (
+                    SELECT path FROM (
+                        SELECT path, ROW_NUMBER() OVER newest AS pages, SUM(size) OVER newest AS bytes
+                        FROM pages WINDOW newest AS (ORDER BY used DESC, path)
+                    )
+                    WHERE pages > ? OR bytes > ?
+                )
+            """, (MAX_PAGES, MAX_BYTES))
+    except sqlite3.Error:
+        log.warning("Page cache store failed for %s", path, exc_info=True)
+
+def clear():
+    """Drop every stored page, e.g. after the database file has been replaced."""
+    if os.path.exists(CACHE_PATH):
+        with store() as conn:
+            conn.execute("DELETE FROM pages")
+
+
+# ----------------------------
+# VIEWS
+# ----------------------------
+def cached_page(scope, daily=False):
+    """Serve a view through the page cache, versioned by its project (or the dashboard).
+
+    daily=True adds today's date to the version, for pages that count days.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(**kwargs):
+            key = kwargs[SCOPE_ARGS[scope]] if scope in SCOPE_ARGS else DASHBOARD
+            # Read the version before rendering: a write landing mid-render bumps it,
+            # so a page that mixes old and new rows is stored under a version nobody asks for again
+            row = get_db().execute(VERSION_SQL[scope], (key,)).fetchone()
+            if row is None:
+                return view(**kwargs)  # unknown project or task: let the view respond as before
+            etag = f"{scope}-{key}-{row[0]}-{CODE_VERSION}"
+            if daily:
+                etag += "-" + datetime.now().date().isoformat()
+
+            if request.if_none_match.contains(etag):
+                return revalidate(Response(status=304), etag)
+            path = request.full_path
+            page = lookup(path, etag) if MAX_BYTES > 0 else None
+            if page is not None:
+                return revalidate(Response(page[1], mimetype=page[0]), etag)
+
+            response = make_response(view(**kwargs))
+            if response.status_code != 200:
+                return response
+            revalidate(response, etag)
+            if MAX_BYTES > 0:
+                if response.is_streamed:
+                    response.response = save_as_sent(response, path, etag)
+                elif response.content_length <= MAX_PAGE_BYTES:
+                    save(path, etag, response.mimetype, response.get_data())
+            return response
+        return wrapper
+    return decorator
+
+def revalidate(response, etag):
+    # Browsers may keep the page but must check the ETag before every reuse
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+def save_as_sent(response, path, etag):
+    """Stream the page to the client unchanged, storing it once the last chunk has gone out."""
+    # Taken before the caller swaps in the generator below as the response body
+    original, chunks = response.response, response.iter_encoded()
+
+    def tee():
+        body, size = [], 0
+        try:
+            for chunk in chunks:
+                yield chunk
+                if body is not None:
+                    body.append(chunk)
+                    size += len(chunk)
+                    if size > MAX_PAGE_BYTES:
+                        body = None
+            if body is not None:
+                save(path, etag, response.mimetype, b"".join(body))
+        finally:
+            # Werkzeug only closes the body it is handed; pass that on to the view's generator
+            if hasattr(original, "close"):
+                original.close()
+    return tee()
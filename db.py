@@ -0,0 +1,76 @@
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+from flask import g
+
+# Get the absolute path to the directory this file is in
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+# FAIRSHARE_DB points the app (and seed.py / bench.py) at another database file
+DB_PATH = os.environ.get("FAIRSHARE_DB", os.path.join(BASE_DIR, "fairshare.db"))
+
+# Applied once per connection, when it is opened (journal_mode=WAL is persistent
+# in the database file and is set by the migrations instead)
+PRAGMAS = (
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA synchronous = NORMAL",   # safe with WAL, skips an fsync per commit
+    "PRAGMA cache_size = -16000",    # ~16 MB page cache per connection
+    "PRAGMA mmap_size = 268435456",  # 256 MB memory-mapped reads
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 30000",
+)
+
+# Called with every new connection, e.g. to install trace callbacks for profiling
+CONNECT_HOOKS = []
+# Class used for new connections; metrics.py swaps in a timing subclass when enabled
+CONNECTION_CLASS = sqlite3.Connection
+
+# Connections are reused for the life of a worker thread; the pid check makes
+# sure a forked gunicorn worker never inherits its master's handles
+_local = threading.local()
+
+
+# ----------------------------
+# CONNECTIONS
+# ----------------------------
+def connect(readonly=False):
+    """Open a new tuned connection. Read-only handles can never take the write lock."""
+    if readonly:
+        conn = sqlite3.connect(Path(DB_PATH).resolve().as_uri() + "?mode=ro", uri=True, timeout=30,
+                               factory=CONNECTION_CLASS)
+    else:
+        # IMMEDIATE takes the write lock up front instead of failing on a read->write upgrade
+        conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level="IMMEDIATE", factory=CONNECTION_CLASS)
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    for hook in CONNECT_HOOKS:
+        hook(conn)
+    return conn
+
+def worker_connection(readonly=False):
+    if getattr(_local, "pid", None) != os.getpid():
+        _local.pid = os.getpid()
+        _local.connections = {}
+    conn = _local.connections.get(readonly)
+    if conn is None:
+        conn = _local.connections[readonly] = connect(readonly)
+    return conn
+
+def get_db(write=False):
+    """Return this request's connection: the read-only handle by default, the writer with write=True."""
+    key = "db_writer" if write else "db_reader"
+    if key not in g:
+        setattr(g, key, worker_connection(readonly=not write))
+    return getattr(g, key)
+
+def release_db(exc=None):
+    # Connections stay open for the next request; only drop anything left uncommitted
+    for key in ("db_reader", "db_writer"):
+        conn = g.pop(key, None)
+        if conn is not None and conn.in_transaction:
+            conn.rollback()
+
+def init_app(app):
+    app.teardown_appcontext(release_db)
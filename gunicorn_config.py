@@ -0,0 +1,31 @@
+import os
+
+import cache
+import metrics
+import migrations
+
+def on_starting(server):
+    # Apply schema migrations once in the master, before any worker opens the database
+    version = migrations.migrate_db()
+    server.log.info("Database schema at version %s", version)
+    # The database may have been swapped since the last run; pages cached against it must go
+    cache.clear()
+    if metrics.ENABLED and metrics.METRICS_DIR:
+        # Counters start from zero with each new master
+        os.makedirs(metrics.METRICS_DIR, exist_ok=True)
+        metrics.clear_dir()
+
+def post_fork(server, worker):
+    # Runs in each new worker: its totals reach the shared directory on a timer, busy or idle
+    if metrics.ENABLED and metrics.METRICS_DIR:
+        metrics.start_flusher()
+
+def worker_exit(server, worker):
+    # Runs in the worker: write out whatever it recorded since its last flush
+    if metrics.ENABLED and metrics.METRICS_DIR:
+        metrics.flush()
+
+def child_exit(server, worker):
+    # Runs in the master once the worker is gone
+    if metrics.ENABLED and metrics.METRICS_DIR:
+        metrics.archive_worker(worker.pid)
@@ -0,0 +1,256 @@
+import glob
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+from flask import Response, g, has_app_context, request
+
+import db
+
+# ----------------------------
+# REQUEST / SQL METRICS
+# ----------------------------
+# Opt-in with FAIRSHARE_METRICS=1. Every statement on the app's connections is counted
+# and timed against the current request, and /metrics serves the totals in Prometheus
+# text format. Under gunicorn, set FAIRSHARE_METRICS_DIR to a directory shared by the
+# workers: each worker writes its totals there, and /metrics adds them all up.
+ENABLED = os.environ.get("FAIRSHARE_METRICS") == "1"
+METRICS_DIR = os.environ.get("FAIRSHARE_METRICS_DIR")
+SLOW_QUERY_MS = float(os.environ.get("FAIRSHARE_SLOW_QUERY_MS", "100"))
+FLUSH_SECONDS = 5
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRIC_HELP = {
+    "fairshare_http_requests_total": ("counter", "HTTP requests by route, method and status."),
+    "fairshare_http_request_duration_seconds": ("histogram", "Time to send the full response, by route."),
+    "fairshare_sql_statements_total": ("counter", "SQL statements executed, by route."),
+    "fairshare_sql_duration_seconds_total": ("counter", "Time spent executing SQL statements, by route."),
+    "fairshare_sql_lock_wait_seconds_total": ("counter", "Time spent waiting for the SQLite write lock, by route."),
+    "fairshare_sql_slow_queries_total": ("counter", "Statements slower than FAIRSHARE_SLOW_QUERY_MS, by route."),
+}
+
+log = logging.getLogger("fairshare.sql")
+
+# Every series is a plain number keyed by (name, labels). Histograms are stored as their
+# cumulative _bucket/_sum/_count series, so merging workers is just adding numbers up.
+_samples = defaultdict(float)
+_lock = threading.Lock()
+
+
+class RequestStats:
+    __slots__ = ("route", "statements", "sql_seconds", "lock_wait_seconds", "slow_queries")
+
+    def __init__(self, route):
+        self.route = route
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.lock_wait_seconds = 0.0
+        self.slow_queries = 0
+
+def current_stats():
+    return getattr(g, "request_stats", None) if has_app_context() else None
+
+
+class TimedConnection(sqlite3.Connection):
+    """Connection that charges the time of each statement to the current request."""
+
+    def execute(self, sql, parameters=()):
+        stats = current_stats()
+        if stats is None:
+            return super().execute(sql, parameters)
+        if self.isolation_level is not None and not self.in_transaction and is_write(sql):
+            # Open the transaction ourselves so the wait for the write lock is measured on its own
+            self.begin(stats)
+        elif sql.lstrip()[:15].upper().startswith(("BEGIN IMMEDIATE", "BEGIN EXCLUSIVE")):
+            return self.begin(stats, sql)
+        start = time.perf_counter()
+        cursor = super().execute(sql, parameters)
+        self.record(stats, sql, parameters, time.perf_counter() - start)
+        return cursor
+
+    def executemany(self, sql, seq_of_parameters):
+        stats = current_stats()
+        if stats is None:
+            return super().executemany(sql, seq_of_parameters)
+        if self.isolation_level is not None and not self.in_transaction and is_write(sql):
+            self.begin(stats)
+        start = time.perf_counter()
+        cursor = super().executemany(sql, seq_of_parameters)
+        self.record(stats, sql, None, time.perf_counter() - start)
+        return cursor
+
+    def commit(self):
+        stats = current_stats()
+        start = time.perf_counter()
+        super().commit()
+        if stats is not None:
+            self.record(stats, "COMMIT", None, time.perf_counter() - start)
+
+    def begin(self, stats, sql=None):
+        start = time.perf_counter()
+        cursor = super().execute(sql or f"BEGIN {self.isolation_level}")
+        stats.lock_wait_seconds += time.perf_counter() - start
+        stats.statements += 1
+        return cursor
+
+    def record(self, stats, sql, parameters, elapsed):
+        stats.statements += 1
+        stats.sql_seconds += elapsed
+        if elapsed * 1000 >= SLOW_QUERY_MS:
+            stats.slow_queries += 1
+            log.warning("Slow query on %s (%.1f ms): %s params=%r plan=%s",
+                        stats.route, elapsed * 1000, " ".join(sql.split()), parameters,
+                        self.query_plan(sql, parameters))
+
+    def query_plan(self, sql, parameters):
+        if parameters is None or not sql.lstrip().upper().startswith(("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")):
+            return None
+        try:
+            return [row[3] for row in super().execute("EXPLAIN QUERY PLAN " + sql, parameters)]
+        except sqlite3.Error:
+            return None
+
+def is_write(sql):
+    return sql.lstrip()[:7].upper().startswith(("INSERT", "UPDATE", "DELETE", "REPLACE"))
+
+
+# ----------------------------
+# RECORDING
+# ----------------------------
+def start_request():
+    route = request.url_rule.rule if request.url_rule else "<unmatched>"
+    g.request_stats = RequestStats(route)
+    g.request_started = time.perf_counter()
+
+def finish_request(response):
+    stats, started, method = g.request_stats, g.request_started, request.method
+    # Streamed responses are still being generated here, so record once the body has been sent
+    response.call_on_close(lambda: record_request(stats, method, response.status_code,
+                                                  time.perf_counter() - started))
+    return response
+
+def record_request(stats, method, status, elapsed):
+    route = (("route", stats.route),)
+    with _lock:
+        _samples[("fairshare_http_requests_total", route + (("method", method), ("status", str(status))))] += 1
+        for bound in LATENCY_BUCKETS:
+            _samples[("fairshare_http_request_duration_seconds_bucket", route + (("le", str(bound)),))] += elapsed <= bound
+        _samples[("fairshare_http_request_duration_seconds_bucket", route + (("le", "+Inf"),))] += 1
+        _samples[("fairshare_http_request_duration_seconds_sum", route)] += elapsed
+        _samples[("fairshare_http_request_duration_seconds_count", route)] += 1
+        _samples[("fairshare_sql_statements_total", route)] += stats.statements
+        _samples[("fairshare_sql_duration_seconds_total", route)] += stats.sql_seconds
+        _samples[("fairshare_sql_lock_wait_seconds_total", route)] += stats.lock_wait_seconds
+        _samples[("fairshare_sql_slow_queries_total", route)] += stats.slow_queries
+
+
+# ----------------------------
+# CROSS-WORKER AGGREGATION
+# ----------------------------
+def dump(samples):
+    return [[name, list(labels), value] for (name, labels), value in samples.items()]
+
+def load(path):
+    try:
+        with open(path) as f:
+            return {(name, tuple(map(tuple, labels))): value for name, labels, value in json.load(f)}
+    except (OSError, ValueError):
+        return {}
+
+def write(path, samples):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"  # the flush thread and worker_exit may overlap
+    with open(tmp, "w") as f:
+        json.dump(dump(samples), f)
+    os.replace(tmp, path)  # readers never see a half-written file
+
+def flush():
+    """Write this worker's totals to the shared metrics directory."""
+    with _lock:
+        samples = dict(_samples)
+    write(os.path.join(METRICS_DIR, f"worker-{os.getpid()}.json"), samples)
+
+def start_flusher():
+    """Flush every FLUSH_SECONDS from a background thread, so idle workers still report."""
+    def run():
+        while True:
+            time.sleep(FLUSH_SECONDS)
+            try:
+                flush()
+            except OSError:
+                log.warning("Could not write metrics to %s", METRICS_DIR, exc_info=True)
+    threading.Thread(target=run, name="metrics-flush", daemon=True).start()
+
+def archive_worker(pid):
+    """Fold an exited worker's totals into the archive so counters never go backwards."""
+    path = os.path.join(METRICS_DIR, f"worker-{pid}.json")
+    if not os.path.exists(path):
+        return
+    archive_path = os.path.join(METRICS_DIR, "archive.json")
+    archive = defaultdict(float, load(archive_path))
+    for key, value in load(path).items():
+        archive[key] += value
+    write(archive_path, archive)
+    os.remove(path)
+
+def clear_dir():
+    for path in glob.glob(os.path.join(METRICS_DIR, "*.json")):
+        os.remove(path)
+
+def collect():
+    if not METRICS_DIR:
+        with _lock:
+            return dict(_samples)
+    flush()
+    total = defaultdict(float)
+    for path in glob.glob(os.path.join(METRICS_DIR, "*.json")):
+        for key, value in load(path).items():
+            total[key] += value
+    return total
+
+
+# ----------------------------
+# /metrics
+# ----------------------------
+def family(name):
+    for suffix in ("_bucket", "_sum", "_count"):
+        if name.endswith(suffix) and name[:-len(suffix)] in METRIC_HELP:
+            return name[:-len(suffix)]
+    return name
+
+def render(samples):
+    lines, seen = [], set()
+    for (name, labels), value in sorted(samples.items(), key=sort_key):
+        base = family(name)
+        if base not in seen and base in METRIC_HELP:
+            kind, help_text = METRIC_HELP[base]
+            lines += [f"# HELP {base} {help_text}", f"# TYPE {base} {kind}"]
+            seen.add(base)
+        label_text = ",".join(f'{key}="{escape(val)}"' for key, val in labels)
+        number = str(int(value)) if value.is_integer() else repr(value)
+        lines.append(f"{name}{{{label_text}}} {number}" if label_text else f"{name} {number}")
+    return "\n".join(lines) + "\n"
+
+def sort_key(item):
+    # Keep each family together, and histogram buckets in ascending order of their bound
+    (name, labels), _ = item
+    return family(name), name, tuple((key, float(val) if key == "le" else val) for key, val in labels)
+
+def escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def metrics_endpoint():
+    return Response(render(collect()), mimetype="text/plain; version=0.0.4")
+
+def init_app(app):
+    if not ENABLED:
+        return
+    db.CONNECTION_CLASS = TimedConnection
+    if METRICS_DIR:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+    app.before_request(start_request)
+    app.after_request(finish_request)
+    app.add_url_rule("/metrics", "metrics", metrics_endpoint)
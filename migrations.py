@@ -0,0 +1,442 @@
+import db
+import rollups
+
+# ----------------------------
+# SCHEMA MIGRATIONS
+# ----------------------------
+# Each migration brings the schema from version N-1 to N (tracked in PRAGMA user_version).
+# Databases created before versioning are at version 0, so the early steps are written
+# to be safe against tables and columns that may already exist.
+
+def add_column(conn, table, column, declaration):
+    columns = [row['name'] for row in conn.execute(f"PRAGMA table_info({table})")]
+    if column in columns:
+        return False
+    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+    return True
+
+def create_tables(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS projects (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, deadline TEXT)")
+    conn.execute("CREATE TABLE IF NOT EXISTS members (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, project_id INTEGER, FOREIGN KEY (project_id) REFERENCES projects(id) ON DELETE CASCADE)")
+    conn.execute("CREATE TABLE IF NOT EXISTS modules (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, project_id INTEGER, assigned_member_id INTEGER, completed INTEGER DEFAULT 0, FOREIGN KEY (project_id) REFERENCES projects(id) ON DELETE CASCADE, FOREIGN KEY (assigned_member_id) REFERENCES members(id))")
+    conn.execute("CREATE TABLE IF NOT EXISTS module_updates (id INTEGER PRIMARY KEY AUTOINCREMENT, module_id INTEGER, update_date TEXT, update_text TEXT, FOREIGN KEY (module_id) REFERENCES modules(id) ON DELETE CASCADE)")
+    add_column(conn, "modules", "priority", "TEXT DEFAULT 'Medium'")
+
+def add_progress_counters(conn):
+    # Per-project progress counters so the dashboard never has to count modules
+    added = add_column(conn, "projects", "total_modules", "INTEGER NOT NULL DEFAULT 0")
+    add_column(conn, "projects", "completed_modules", "INTEGER NOT NULL DEFAULT 0")
+    if added:
+        # Backfill once, when the columns are first added
+        conn.execute("""
+            UPDATE projects SET
+                total_modules = (SELECT COUNT(*) FROM modules WHERE modules.project_id = projects.id),
+                completed_modules = (SELECT COUNT(*) FROM modules WHERE modules.project_id = projects.id AND modules.completed)
+        """)
+
+    # Triggers keep the counters correct for every write path (add, complete, edit, delete)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS modules_counters_insert AFTER INSERT ON modules
+        BEGIN
+            UPDATE projects SET total_modules = total_modules + 1,
+                                completed_modules = completed_modules + (NEW.completed != 0)
+            WHERE id = NEW.project_id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS modules_counters_delete AFTER DELETE ON modules
+        BEGIN
+            UPDATE projects SET total_modules = total_modules - 1,
+                                completed_modules = completed_modules - (OLD.completed != 0)
+            WHERE id = OLD.project_id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS modules_counters_update AFTER UPDATE OF completed, project_id ON modules
+        BEGIN
+            UPDATE projects SET total_modules = total_modules - 1,
+                                completed_modules = completed_modules - (OLD.completed != 0)
+            WHERE id = OLD.project_id;
+            UPDATE projects SET total_modules = total_modules + 1,
+                                completed_modules = completed_modules + (NEW.completed != 0)
+            WHERE id = NEW.project_id;
+        END
+    """)
+
+def add_hot_path_indexes(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_members_project ON members(project_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_modules_project ON modules(project_id)")
+    # Matches the ORDER BY in project_modules so the task list comes back pre-sorted
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_modules_project_priority ON modules(
+            project_id,
+            (CASE priority WHEN 'High' THEN 1 WHEN 'Medium' THEN 2 ELSE 3 END),
+            completed
+        )
+    """)
+    # Lets the foreign key check on member deletes (project cascade) avoid scanning modules
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_modules_assigned_member ON modules(assigned_member_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_module_updates_module_date ON module_updates(module_id, update_date)")
+
+def add_update_search(conn):
+    # Full-text index over update text plus the task and project names. Rows share the
+    # module_updates id as their rowid; project_id is indexed so searches can be scoped.
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS update_search USING fts5(
+            update_text, module_name, project_name, project_id,
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+    """)
+
+    # Triggers keep the index in step with every write path, including cascading deletes
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS update_search_insert AFTER INSERT ON module_updates
+        BEGIN
+            INSERT INTO update_search (rowid, update_text, module_name, project_name, project_id)
+            SELECT NEW.id, NEW.update_text, m.name, p.name, p.id
+            FROM modules m JOIN projects p ON p.id = m.project_id
+            WHERE m.id = NEW.module_id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS update_search_delete AFTER DELETE ON module_updates
+        BEGIN
+            DELETE FROM update_search WHERE rowid = OLD.id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS update_search_update AFTER UPDATE OF update_text, module_id ON module_updates
+        BEGIN
+            DELETE FROM update_search WHERE rowid = OLD.id;
+            INSERT INTO update_search (rowid, update_text, module_name, project_name, project_id)
+            SELECT NEW.id, NEW.update_text, m.name, p.name, p.id
+            FROM modules m JOIN projects p ON p.id = m.project_id
+            WHERE m.id = NEW.module_id;
+        END
+    """)
+    # edit_module rewrites the name on every save, so only reindex when it actually changes
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS update_search_module_rename AFTER UPDATE OF name, project_id ON modules
+        WHEN OLD.name IS NOT NEW.name OR OLD.project_id IS NOT NEW.project_id
+        BEGIN
+            UPDATE update_search
+            SET module_name = NEW.name,
+                project_name = (SELECT name FROM projects WHERE id = NEW.project_id),
+                project_id = NEW.project_id
+            WHERE rowid IN (SELECT id FROM module_updates WHERE module_id = NEW.id);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS update_search_project_rename AFTER UPDATE OF name ON projects
+        WHEN OLD.name IS NOT NEW.name
+        BEGIN
+            UPDATE update_search SET project_name = NEW.name
+            WHERE rowid IN (SELECT u.id FROM modules m JOIN module_updates u ON u.module_id = m.id
+                            WHERE m.project_id = NEW.id);
+        END
+    """)
+    rebuild_update_search(conn)
+
+def rebuild_update_search(conn):
+    """Backfill (or repair) the search index from module_updates."""
+    conn.execute("DELETE FROM update_search")
+    conn.execute("""
+        INSERT INTO update_search (rowid, update_text, module_name, project_name, project_id)
+        SELECT u.id, u.update_text, m.name, p.name, p.id
+        FROM module_updates u
+        JOIN modules m ON m.id = u.module_id
+        JOIN projects p ON p.id = m.project_id
+    """)
+    conn.execute("INSERT INTO update_search (update_search) VALUES ('optimize')")
+
+def add_contribution_rollups(conn):
+    # Optional per-task weight, so bigger tasks can count for more in contribution shares
+    add_column(conn, "modules", "weight", "INTEGER NOT NULL DEFAULT 1")
+
+    # Running totals per member, and update counts per member per day and per Monday-based
+    # '%Y-W%W' week. An update is credited to its task's current lead, so reassigning a
+    # task moves its updates (and their activity buckets) to the new lead.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS member_stats (
+            member_id INTEGER PRIMARY KEY,
+            project_id INTEGER,
+            assigned INTEGER NOT NULL DEFAULT 0,
+            completed INTEGER NOT NULL DEFAULT 0,
+            updates INTEGER NOT NULL DEFAULT 0,
+            assigned_weight INTEGER NOT NULL DEFAULT 0,
+            completed_weight INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_member_stats_project ON member_stats(project_id)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS member_activity (
+            member_id INTEGER NOT NULL,
+            period TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            updates INTEGER NOT NULL,
+            PRIMARY KEY (member_id, period, bucket)
+        ) WITHOUT ROWID
+    """)
+
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS rollup_member_insert AFTER INSERT ON members
+        BEGIN
+            INSERT INTO member_stats (member_id, project_id) VALUES (NEW.id, NEW.project_id);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS rollup_member_delete AFTER DELETE ON members
+        BEGIN
+            DELETE FROM member_stats WHERE member_id = OLD.id;
+            DELETE FROM member_activity WHERE member_id = OLD.id;
+        END
+    """)
+
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS rollup_module_insert AFTER INSERT ON modules
+        BEGIN
+            UPDATE member_stats SET assigned = assigned + 1,
+                                    completed = completed + (NEW.completed != 0),
+                                    assigned_weight = assigned_weight + NEW.weight,
+                                    completed_weight = completed_weight + NEW.weight * (NEW.completed != 0)
+            WHERE member_id = NEW.assigned_member_id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS rollup_module_update AFTER UPDATE OF completed, weight, assigned_member_id ON modules
+        WHEN OLD.completed IS NOT NEW.completed OR OLD.weight IS NOT NEW.weight
+          OR OLD.assigned_member_id IS NOT NEW.assigned_member_id
+        BEGIN
+            UPDATE member_stats SET assigned = assigned - 1,
+                                    completed = completed - (OLD.completed != 0),
+                                    assigned_weight = assigned_weight - OLD.weight,
+                                    completed_weight = completed_weight - OLD.weight * (OLD.completed != 0)
+            WHERE member_id = OLD.assigned_member_id;
+            UPDATE member_stats SET assigned = assigned + 1,
+                                    completed = completed + (NEW.completed != 0),
+                                    assigned_weight = assigned_weight + NEW.weight,
+                                    completed_weight = completed_weight + NEW.weight * (NEW.completed != 0)
+            WHERE member_id = NEW.assigned_member_id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS rollup_module_reassign AFTER UPDATE OF assigned_member_id ON modules
+        WHEN OLD.assigned_member_id IS NOT NEW.assigned_member_id
+        BEGIN
+            UPDATE member_stats SET updates = updates - (SELECT COUNT(*) FROM module_updates WHERE module_id = NEW.id)
+            WHERE member_id = OLD.assigned_member_id;
+            UPDATE member_stats SET updates = updates + (SELECT COUNT(*) FROM module_updates WHERE module_id = NEW.id)
+            WHERE member_id = NEW.assigned_member_id;
+            INSERT INTO member_activity (member_id, period, bucket, updates)
+            SELECT OLD.assigned_member_id, 'day', COALESCE(date(update_date), ''), -COUNT(*)
+            FROM module_updates WHERE module_id = NEW.id AND OLD.assigned_member_id IS NOT NULL
+            GROUP BY 3
+            ON CONFLICT (member_id, period, bucket) DO UPDATE SET updates = updates + excluded.updates;
+            INSERT INTO member_activity (member_id, period, bucket, updates)
+            SELECT OLD.assigned_member_id, 'week', COALESCE(strftime('%Y-W%W', update_date), ''), -COUNT(*)
+            FROM module_updates WHERE module_id = NEW.id AND OLD.assigned_member_id IS NOT NULL
+            GROUP BY 3
+            ON CONFLICT (member_id, period, bucket) DO UPDATE SET updates = updates + excluded.updates;
+            INSERT INTO member_activity (member_id, period, bucket, updates)
+            SELECT NEW.assigned_member_id, 'day', COALESCE(date(update_date), ''), +COUNT(*)
+            FROM module_updates WHERE module_id = NEW.id AND NEW.assigned_member_id IS NOT NULL
+            GROUP BY 3
+            ON CONFLICT (member_id, period, bucket) DO UPDATE SET updates = updates + excluded.updates;
+            INSERT INTO member_activity (member_id, period, bucket, updates)
+            SELECT NEW.assigned_member_id, 'week', COALESCE(strftime('%Y-W%W', update_date), ''), +COUNT(*)
+            FROM module_updates WHERE module_id = NEW.id AND NEW.assigned_member_id IS NOT NULL
+            GROUP BY 3
+            ON CONFLICT (member_id, period, bucket) DO UPDATE SET updates = updates + excluded.updates;
+            DELETE FROM member_activity WHERE member_id = OLD.assigned_member_id AND updates = 0;
+        END
+    """)
+    # BEFORE, so the task's updates are still there to subtract; the cascade that follows
+    # finds no task left and leaves the rollups alone
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS rollup_module_delete BEFORE DELETE ON modules
+        BEGIN
+            UPDATE member_stats SET assigned = assigned - 1,
+                                    completed = completed - (OLD.completed != 0),
+                                    assigned_weight = assigned_weight - OLD.weight,
+                                    completed_weight = completed_weight - OLD.weight * (OLD.completed != 0),
+                                    updates = updates - (SELECT COUNT(*) FROM module_updates WHERE module_id = OLD.id)
+            WHERE member_id = OLD.assigned_member_id;
+            INSERT INTO member_activity (member_id, period, bucket, updates)
+            SELECT OLD.assigned_member_id, 'day', COALESCE(date(update_date), ''), -COUNT(*)
+            FROM module_updates WHERE module_id = OLD.id AND OLD.assigned_member_id IS NOT NULL
+            GROUP BY 3
+            ON CONFLICT (member_id, period, bucket) DO UPDATE SET updates = updates + excluded.updates;
+            INSERT INTO member_activity (member_id, period, bucket, updates)
+            SELECT OLD.assigned_member_id, 'week', COALESCE(strftime('%Y-W%W', update_date), ''), -COUNT(*)
+            FROM module_updates WHERE module_id = OLD.id AND OLD.assigned_member_id IS NOT NULL
+            GROUP BY 3
+            ON CONFLICT (member_id, period, bucket) DO UPDATE SET updates = updates + excluded.updates;
+            DELETE FROM member_activity WHERE member_id = OLD.assigned_member_id AND updates = 0;
+        END
+    """)
+
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS rollup_update_insert AFTER INSERT ON module_updates
+        BEGIN
+            UPDATE member_stats SET updates = updates + 1
+            WHERE member_id = (SELECT assigned_member_id FROM modules WHERE id = NEW.module_id);
+            INSERT INTO member_activity (member_id, period, bucket, updates)
+            SELECT assigned_member_id, 'day', COALESCE(date(NEW.update_date), ''), +1
+            FROM modules WHERE id = NEW.module_id AND assigned_member_id IS NOT NULL
+            ON CONFLICT (member_id, period, bucket) DO UPDATE SET updates = updates + excluded.updates;
+            INSERT INTO member_activity (member_id, period, bucket, updates)
+            SELECT assigned_member_id, 'week', COALESCE(strftime('%Y-W%W', NEW.update_date), ''), +1
+            FROM modules WHERE id = NEW.module_id AND assigned_member_id IS NOT NULL
+            ON CONFLICT (member_id, period, bucket) DO UPDATE SET updates = updates + excluded.updates;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS rollup_update_delete AFTER DELETE ON module_updates
+        BEGIN
+            UPDATE member_stats SET updates = updates - 1
+            WHERE member_id = (SELECT assigned_member_id FROM modules WHERE id = OLD.module_id);
+            INSERT INTO member_activity (member_id, period, bucket, updates)
+            SELECT assigned_member_id, 'day', COALESCE(date(OLD.update_date), ''), -1
+            FROM modules WHERE id = OLD.module_id AND assigned_member_id IS NOT NULL
+            ON CONFLICT (member_id, period, bucket) DO UPDATE SET updates = updates + excluded.updates;
+            INSERT INTO member_activity (member_id, period, bucket, updates)
+            SELECT assigned_member_id, 'week', COALESCE(strftime('%Y-W%W', OLD.update_date), ''), -1
+            FROM modules WHERE id = OLD.module_id AND assigned_member_id IS NOT NULL
+            ON CONFLICT (member_id, period, bucket) DO UPDATE SET updates = updates + excluded.updates;
+            DELETE FROM member_activity WHERE updates = 0
+              AND member_id = (SELECT assigned_member_id FROM modules WHERE id = OLD.module_id);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS rollup_update_change AFTER UPDATE OF update_date, module_id ON module_updates
+        BEGIN
+            UPDATE member_stats SET updates = updates - 1
+            WHERE member_id = (SELECT assigned_member_id FROM modules WHERE id = OLD.module_id);
+            INSERT INTO member_activity (member_id, period, bucket, updates)
+            SELECT assigned_member_id, 'day', COALESCE(date(OLD.update_date), ''), -1
+            FROM modules WHERE id = OLD.module_id AND assigned_member_id IS NOT NULL
+            ON CONFLICT (member_id, period, bucket) DO UPDATE SET updates = updates + excluded.updates;
+            INSERT INTO member_activity (member_id, period, bucket, updates)
+            SELECT assigned_member_id, 'week', COALESCE(strftime('%Y-W%W', OLD.update_date), ''), -1
+            FROM modules WHERE id = OLD.module_id AND assigned_member_id IS NOT NULL
+            ON CONFLICT (member_id, period, bucket) DO UPDATE SET updates = updates + excluded.updates;
+            UPDATE member_stats SET updates = updates + 1
+            WHERE member_id = (SELECT assigned_member_id FROM modules WHERE id = NEW.module_id);
+            INSERT INTO member_activity (member_id, period, bucket, updates)
+            SELECT assigned_member_id, 'day', COALESCE(date(NEW.update_date), ''), +1
+            FROM modules WHERE id = NEW.module_id AND assigned_member_id IS NOT NULL
+            ON CONFLICT (member_id, period, bucket) DO UPDATE SET updates = updates + excluded.updates;
+            INSERT INTO member_activity (member_id, period, bucket, updates)
+            SELECT assigned_member_id, 'week', COALESCE(strftime('%Y-W%W', NEW.update_date), ''), +1
+            FROM modules WHERE id = NEW.module_id AND assigned_member_id IS NOT NULL
+            ON CONFLICT (member_id, period, bucket) DO UPDATE SET updates = updates + excluded.updates;
+            DELETE FROM member_activity WHERE updates = 0
+              AND member_id = (SELECT assigned_member_id FROM modules WHERE id = OLD.module_id);
+        END
+    """)
+    rollups.rebuild(conn)
+
+def add_change_versions(conn):
+    # A change counter per project (row 0 is the dashboard) for the page cache's ETags.
+    # Counters start from a random point, so a fresh database never repeats the
+    # versions of one whose pages are still cached.
+    conn.execute("CREATE TABLE IF NOT EXISTS change_versions (project_id INTEGER PRIMARY KEY, version INTEGER NOT NULL)")
+    conn.execute("INSERT OR IGNORE INTO change_versions (project_id, version) VALUES (0, abs(random() >> 16))")
+    conn.execute("""
+        INSERT OR IGNORE INTO change_versions (project_id, version)
+        SELECT id, (SELECT version FROM change_versions WHERE project_id = 0) FROM projects
+    """)
+
+    # The dashboard lists the projects table (its progress counters included), nothing else
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS versions_project_insert AFTER INSERT ON projects
+        BEGIN
+            UPDATE change_versions SET version = version + 1 WHERE project_id = 0;
+            INSERT INTO change_versions (project_id, version)
+            SELECT NEW.id, version FROM change_versions WHERE project_id = 0;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS versions_project_update AFTER UPDATE ON projects
+        BEGIN
+            UPDATE change_versions SET version = version + 1 WHERE project_id IN (0, NEW.id);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS versions_project_delete AFTER DELETE ON projects
+        BEGIN
+            UPDATE change_versions SET version = version + 1 WHERE project_id = 0;
+            DELETE FROM change_versions WHERE project_id = OLD.id;
+        END
+    """)
+    # Everything else bumps the project it belongs to
+    owners = {
+        "members": "{row}.project_id",
+        "modules": "{row}.project_id",
+        "module_updates": "(SELECT project_id FROM modules WHERE id = {row}.module_id)",
+    }
+    for table, owner in owners.items():
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS versions_{table}_insert AFTER INSERT ON {table}
+            BEGIN
+                UPDATE change_versions SET version = version + 1 WHERE project_id = {owner.format(row="NEW")};
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS versions_{table}_delete AFTER DELETE ON {table}
+            BEGIN
+                UPDATE change_versions SET version = version + 1 WHERE project_id = {owner.format(row="OLD")};
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS versions_{table}_update AFTER UPDATE ON {table}
+            BEGIN
+                UPDATE change_versions SET version = version + 1
+                WHERE project_id IN ({owner.format(row="OLD")}, {owner.format(row="NEW")});
+            END
+        """)
+
+def rank_update_search(conn):
+    # bm25 weights per column: update_text, module_name, project_name, project_id (scope only).
+    # Stored as the table's rank, so queries read the rank column instead of repeating them.
+    conn.execute("INSERT INTO update_search (update_search, rank) VALUES ('rank', 'bm25(10.0, 4.0, 2.0, 0.0)')")
+
+MIGRATIONS = [
+    create_tables,
+    add_progress_counters,
+    add_hot_path_indexes,
+    add_update_search,
+    add_contribution_rollups,
+    add_change_versions,
+    rank_update_search,
+]
+
+
+def migrate(conn):
+    """Apply every pending migration, each in its own transaction. Returns the final schema version."""
+    conn.execute("PRAGMA journal_mode=WAL") # Persistent: set once on the file, not per connection
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        # Read the version under the write lock so concurrent runners can't apply a step twice
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= len(MIGRATIONS):
+            conn.rollback()
+            return version
+        try:
+            MIGRATIONS[version](conn)
+            conn.execute(f"PRAGMA user_version = {version + 1}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+def migrate_db():
+    conn = db.connect()
+    try:
+        return migrate(conn)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    print(f"Database schema at version {migrate_db()}")
@@ -0,0 +1,92 @@
+# ----------------------------
+# CONTRIBUTION ROLLUPS
+# ----------------------------
+# member_stats holds one row of running totals per member, and member_activity a
+# per-day and per-week count of logged updates. Triggers keep both current on every
+# write (see migrations.add_contribution_rollups), so contribution views read
+# O(members) rows instead of rescanning updates.
+# An update is credited to the task's current lead: reassigning a task moves its
+# updates (and their activity buckets) to the new lead.
+
+# Bucket labels per period. The triggers that keep member_activity current (migrations.py,
+# add_contribution_rollups) spell out the same expressions: change both, in a new migration.
+BUCKETS = {
+    "day": "COALESCE(date({0}), '')",
+    "week": "COALESCE(strftime('%Y-W%W', {0}), '')",
+}
+
+
+# ----------------------------
+# REBUILD / VERIFY
+# ----------------------------
+# What the rollup tables should contain, computed from scratch
+EXPECTED_STATS = """
+    SELECT mem.id AS member_id, mem.project_id,
+           COUNT(m.id) AS assigned,
+           COALESCE(SUM(m.completed != 0), 0) AS completed,
+           COALESCE(SUM((SELECT COUNT(*) FROM module_updates u WHERE u.module_id = m.id)), 0) AS updates,
+           COALESCE(SUM(m.weight), 0) AS assigned_weight,
+           COALESCE(SUM(m.weight * (m.completed != 0)), 0) AS completed_weight
+    FROM members mem
+    LEFT JOIN modules m ON m.assigned_member_id = mem.id
+    GROUP BY mem.id
+"""
+EXPECTED_ACTIVITY = " UNION ALL ".join(f"""
+    SELECT m.assigned_member_id AS member_id, '{period}' AS period, {bucket.format("u.update_date")} AS bucket,
+           COUNT(*) AS updates
+    FROM module_updates u JOIN modules m ON m.id = u.module_id
+    WHERE m.assigned_member_id IN (SELECT id FROM members)
+    GROUP BY 1, 3
+""" for period, bucket in BUCKETS.items())
+
+def rebuild(conn):
+    """Recompute both rollup tables from members, modules and module_updates."""
+    conn.execute("DELETE FROM member_stats")
+    conn.execute(f"INSERT INTO member_stats {EXPECTED_STATS}")
+    conn.execute("DELETE FROM member_activity")
+    conn.execute(f"INSERT INTO member_activity {EXPECTED_ACTIVITY}")
+
+def verify(conn):
+    """Return the member ids whose rollups disagree with a from-scratch recount."""
+    stats_columns = "member_id, project_id, assigned, completed, updates, assigned_weight, completed_weight"
+    activity_columns = "member_id, period, bucket, updates"
+    rows = conn.execute(f"""
+        SELECT member_id FROM (SELECT {stats_columns} FROM member_stats EXCEPT SELECT * FROM ({EXPECTED_STATS}))
+        UNION
+        SELECT member_id FROM (SELECT * FROM ({EXPECTED_STATS}) EXCEPT SELECT {stats_columns} FROM member_stats)
+        UNION
+        SELECT member_id FROM (SELECT {activity_columns} FROM member_activity EXCEPT SELECT * FROM ({EXPECTED_ACTIVITY}))
+        UNION
+        SELECT member_id FROM (SELECT * FROM ({EXPECTED_ACTIVITY}) EXCEPT SELECT {activity_columns} FROM member_activity)
+    """).fetchall()
+    return [row[0] for row in rows]
+
+
+# ----------------------------
+# READS
+# ----------------------------
+def member_contributions(conn, project_id):
+    """Per-member totals for a project, with each member's share of the (weighted) work."""
+    members = [dict(row) for row in conn.execute("""
+        SELECT mem.id, mem.name, s.assigned, s.completed, s.updates, s.assigned_weight, s.completed_weight
+        FROM member_stats s JOIN members mem ON mem.id = s.member_id
+        WHERE s.project_id = ?
+        ORDER BY s.completed_weight DESC, s.assigned_weight DESC, mem.id
+    """, (project_id,))]
+    # Credit finished work; before anything is finished, fall back to what each member owns
+    key = "completed_weight" if any(m['completed_weight'] for m in members) else "assigned_weight"
+    total = sum(m[key] for m in members)
+    for m in members:
+        m['share'] = round(m[key] * 100 / total) if total else 0
+    return members
+
+def member_activity(conn, project_id, period, since):
+    """Return {member_id: {bucket: updates}} for a project's buckets at or after `since`."""
+    activity = {}
+    for row in conn.execute("""
+        SELECT a.member_id, a.bucket, a.updates
+        FROM members mem JOIN member_activity a ON a.member_id = mem.id
+        WHERE mem.project_id = ? AND a.period = ? AND a.bucket >= ?
+    """, (project_id, period, since)):
+        activity.setdefault(row['member_id'], {})[row['bucket']] = row['updates']
+    return activity
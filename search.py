@@ -0,0 +1,91 @@
+import re
+
+from flask import Blueprint, jsonify, render_template, request
+from markupsafe import Markup, escape
+
+from db import get_db
+
+search = Blueprint("search", __name__)
+
+PAGE_SIZE = 20
+# Private-use markers for snippet(), turned into <mark> only after the text is HTML-escaped
+MARK_START, MARK_END = "\ue000", "\ue001"
+# Columns the user's words are matched against; project_id is indexed only for scoping
+TEXT_COLUMNS = "{update_text module_name project_name}"
+
+def match_expression(text):
+    """Turn free text into a safe FTS5 query: every word must match, the last one as a prefix."""
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    # Without the column filter "150" would also match every update of project 150
+    return f"{TEXT_COLUMNS} : ({' '.join(terms)})"
+
+def parse_after(token):
+    # Keyset cursor: "<rank>:<rowid>" of the last result on the previous page
+    try:
+        score, rowid = token.split(":")
+        return float(score), int(rowid)
+    except (AttributeError, ValueError):
+        return None
+
+def search_updates(text, project_id=None, after=None, limit=PAGE_SIZE):
+    """Return (results, next_after) for one page of matching updates, best matches first."""
+    match = match_expression(text)
+    if match is None or (project_id is not None and project_id < 1):
+        # Project ids are positive; "-1" would tokenize to "1" and quietly search project 1
+        return [], None
+    if project_id is not None:
+        # project_id is an indexed column, so scoping narrows the match instead of filtering after it
+        match = f'{match} AND project_id : "{int(project_id)}"'
+    params = {"match": match, "limit": limit + 1, "start": MARK_START, "end": MARK_END}
+    keyset = ""
+    if after is not None:
+        keyset = "AND (s.rank, s.rowid) > (:after_score, :after_id)"
+        params["after_score"], params["after_id"] = after
+    rows = get_db().execute(f"""
+        SELECT s.rowid AS update_id, u.module_id, u.update_date,
+               s.module_name, s.project_name, s.project_id,
+               snippet(update_search, -1, :start, :end, '…', 16) AS snippet,
+               s.rank AS score
+        FROM update_search s
+        JOIN module_updates u ON u.id = s.rowid
+        WHERE update_search MATCH :match {keyset}
+        -- rank is the bm25 set up by migrations.rank_update_search; rowid breaks ties for the cursor
+        ORDER BY s.rank, s.rowid
+        LIMIT :limit
+    """, params).fetchall()
+
+    results = [dict(row, project_id=int(row['project_id']), snippet=highlight(row['snippet']))
+               for row in rows[:limit]]
+    next_after = f"{results[-1]['score']!r}:{results[-1]['update_id']}" if len(rows) > limit else None
+    return results, next_after
+
+def highlight(snippet):
+    return Markup(str(escape(snippet)).replace(MARK_START, "<mark>").replace(MARK_END, "</mark>"))
+
+def search_args():
+    return (request.args.get("q", "").strip(),
+            request.args.get("project", type=int),
+            parse_after(request.args.get("after")))
+
+@search.route("/search")
+def search_page():
+    text, project_id, after = search_args()
+    results, next_after = search_updates(text, project_id, after) if text else ([], None)
+    project = None
+    if project_id is not None:
+        project = get_db().execute("SELECT id, name FROM projects WHERE id = ?", (project_id,)).fetchone()
+    return render_template("search.html", q=text, project=project, results=results,
+                           after=after, next_after=next_after)
+
+@search.route("/api/search")
+def search_api():
+    text, project_id, after = search_args()
+    limit = max(1, min(request.args.get("limit", PAGE_SIZE, type=int), 100))
+    results, next_after = search_updates(text, project_id, after, limit)
+    for result in results:
+        result['snippet'] = str(result['snippet'])
+    return jsonify(status="success", data=results, next_after=next_after)
@@ -1,19 +1,139 @@
+import argparse
+import random
 import sqlite3
 from datetime import datetime, timedelta
+from itertools import accumulate
+
+import db
+import migrations
 
 def seed():
-    conn = sqlite3.connect("fairshare.db")
+    conn = sqlite3.connect(db.DB_PATH)
     # 1. Create a "Crisis" Project (Overdue)
-    conn.execute("INSERT INTO projects (name, deadline) VALUES (?, ?)", 
+    conn.execute("INSERT INTO projects (name, deadline) VALUES (?, ?)",
                  ("Legacy System Migration", "2024-01-01"))
-    
+
     # 2. Create the "Hackathon" Project (On Track)
     deadline = (datetime.now() + timedelta(days=3)).strftime('%Y-%m-%d')
-    conn.execute("INSERT INTO projects (name, deadline) VALUES (?, ?)", 
+    conn.execute("INSERT INTO projects (name, deadline) VALUES (?, ?)",
                  ("FairShare Final Launch", deadline))
-    
+
     conn.commit()
     conn.close()
     print("Database seeded with demo data!")
 
-seed()
\ No newline at end of file
+# ----------------------------
+# SYNTHETIC DATA GENERATOR
+# ----------------------------
+WORDS = ("api", "auth", "backend", "bug", "chart", "dashboard", "database", "deploy", "design", "docs",
+         "fix", "frontend", "layout", "login", "migration", "refactor", "report", "review", "schema",
+         "search", "test", "timeline", "ui", "upload", "validation")
+SYLLABLES = [c + v for c in "bcdfghklmnprstvz" for v in "aeiou"]
+
+def vocabulary(size):
+    """WORDS followed by made-up words, always the same ones, up to `size` distinct words."""
+    rng = random.Random(0)
+    words, seen = list(WORDS), set(WORDS)
+    while len(words) < size:
+        word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+def zipf_cum_weights(count, skew):
+    # Rank 1 gets the most rows: a few huge projects (or hot tasks) and a long tail of small ones
+    return list(accumulate(1 / rank ** skew for rank in range(1, count + 1)))
+
+def choose(rng, cum_weights, total, batch=100_000):
+    """Yield `total` zipf-distributed indexes, drawn in batches to keep memory flat."""
+    while total > 0:
+        k = min(batch, total)
+        yield from rng.choices(range(len(cum_weights)), cum_weights=cum_weights, k=k)
+        total -= k
+
+def sentence(rng, words, vocabulary=WORDS, cum_weights=None):
+    return " ".join(rng.choices(vocabulary, cum_weights=cum_weights, k=words))
+
+def generate(projects, modules, updates, members_per_project=(2, 8), skew=1.1, seed=None, words=50_000):
+    """Append a synthetic workload to the database: rows are spread over projects with zipf skew."""
+    rng = random.Random(seed)
+    today = datetime.now().date()
+    conn = sqlite3.connect(db.DB_PATH)
+    # Bulk load: durability doesn't matter until the final commit
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA foreign_keys = OFF")
+
+    def next_id(table):
+        # As api.BatchWriter.allocate: stay above sqlite_sequence, so ids of deleted rows are never reused
+        return conn.execute(f"""
+            SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = ?), 0),
+                       COALESCE((SELECT MAX(id) FROM {table}), 0)) + 1
+        """, (table,)).fetchone()[0]
+
+    first_project = next_id("projects")
+    conn.executemany("INSERT INTO projects (id, name, deadline) VALUES (?, ?, ?)", (
+        (first_project + p, f"{sentence(rng, 2).title()} #{p}",
+         "" if rng.random() < 0.1 else (today + timedelta(days=rng.randint(-60, 120))).isoformat())
+        for p in range(projects)
+    ))
+    print(f"  {projects} projects")
+
+    # Members are inserted project by project, so each project owns a contiguous id range
+    member_ranges = []
+    first = next_id("members")
+    for p in range(projects):
+        count = rng.randint(*members_per_project)
+        member_ranges.append((first, count))
+        first += count
+    conn.executemany("INSERT INTO members (id, name, project_id) VALUES (?, ?, ?)", (
+        (first + i, f"Member {first + i}", first_project + p)
+        for p, (first, count) in enumerate(member_ranges) for i in range(count)
+    ))
+    print(f"  {sum(count for _, count in member_ranges)} members")
+
+    # Modules get explicit ids too, so the updates below can address them by offset
+    first_module = next_id("modules")
+    def module_rows():
+        for m, p in enumerate(choose(rng, zipf_cum_weights(projects, skew), modules)):
+            first, count = member_ranges[p]
+            yield (first_module + m, sentence(rng, 2).title(), first_project + p, first + rng.randrange(count),
+                   rng.random() < 0.4, rng.choice(("High", "Medium", "Medium", "Low")))
+    conn.executemany("INSERT INTO modules (id, name, project_id, assigned_member_id, completed, priority) VALUES (?, ?, ?, ?, ?, ?)",
+                     module_rows())
+    print(f"  {modules} modules")
+
+    # Update text follows word frequencies like natural language (zipf, exponent 1): the domain
+    # words match a large share of updates each, the long tail only a handful, so searches
+    # see both very common and rare terms
+    text_words, text_weights = vocabulary(words), zipf_cum_weights(words, 1.0)
+    def update_rows():
+        for m in choose(rng, zipf_cum_weights(modules, skew), updates):
+            yield (first_module + m, (today - timedelta(days=rng.randint(0, 365))).isoformat(),
+                   sentence(rng, 8, text_words, text_weights))
+    conn.executemany("INSERT INTO module_updates (module_id, update_date, update_text) VALUES (?, ?, ?)",
+                     update_rows())
+    print(f"  {updates} updates")
+
+    conn.commit()
+    conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed the FairShare database (FAIRSHARE_DB) with demo or synthetic data.")
+    parser.add_argument("--projects", type=int, help="generate this many synthetic projects instead of the demo data")
+    parser.add_argument("--modules", type=int, default=0, help="total tasks, spread over projects with zipf skew")
+    parser.add_argument("--updates", type=int, default=0, help="total task updates, spread over tasks with zipf skew")
+    parser.add_argument("--members", type=int, nargs=2, default=(2, 8), metavar=("MIN", "MAX"), help="members per project")
+    parser.add_argument("--skew", type=float, default=1.1, help="zipf exponent: higher means a few huge projects")
+    parser.add_argument("--seed", type=int, help="random seed, for reproducible databases")
+    parser.add_argument("--words", type=int, default=50_000, help="vocabulary size for update text")
+    args = parser.parse_args()
+
+    migrations.migrate_db()
+    if args.projects is None:
+        seed()
+    else:
+        print(f"Generating synthetic data in {db.DB_PATH}")
+        generate(args.projects, args.modules, args.updates, tuple(args.members), args.skew, args.seed, args.words)
+        print("Done!")
@@ -0,0 +1,35 @@
+import os
+import sys
+import threading
+
+import pytest
+
+# The app is a set of flat top-level modules; make them importable from tests/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cache
+import db
+import migrations
+
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    """A fully migrated, empty database in a temporary FAIRSHARE_DB."""
+    path = str(tmp_path / "fairshare.db")
+    monkeypatch.setenv("FAIRSHARE_DB", path)
+    monkeypatch.setattr(db, "DB_PATH", path)
+    conn = db.connect()
+    migrations.migrate(conn)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def client(conn, tmp_path, monkeypatch):
+    """A test client for the app, on the same database as `conn`."""
+    import app
+    # Fresh per-thread handles, so no request reuses a connection to another test's database
+    monkeypatch.setattr(db, "_local", threading.local())
+    monkeypatch.setattr(cache, "_local", threading.local())
+    monkeypatch.setattr(cache, "CACHE_PATH", str(tmp_path / "fairshare.db-pages"))
+    return app.app.test_client()
@@ -0,0 +1,29 @@
+import pytest
+
+import app
+
+# Every page's read queries, with parameters of the right shape. The SQL itself comes
+# from app.py, so these plans are the ones the routes actually run.
+HOT_QUERIES = {
+    "home": (app.dashboard_sql(), {"after": 0, "today": "2026-01-01", "limit": app.PAGE_SIZE + 1}),
+    **{f"home_{status}": (app.dashboard_sql(status), {"after": 0, "today": "2026-01-01", "limit": app.PAGE_SIZE + 1})
+       for status in app.STATUS_FILTERS},
+    **{f"home_{status or 'all'}_search": (app.dashboard_sql(status, search=True),
+                                          {"after": 0, "today": "2026-01-01", "q": "%demo%", "limit": app.PAGE_SIZE + 1})
+       for status in (None, *app.STATUS_FILTERS)},
+    "project": (app.PROJECT_SQL, (1,)),
+    "project_modules": (app.PROJECT_MODULES_SQL, (1,)),
+    "project_members": (app.PROJECT_MEMBERS_SQL, (1,)),
+    "module": (app.MODULE_SQL, (1,)),
+    "module_member": (app.MEMBER_SQL, (1,)),
+    "module_updates": (app.MODULE_UPDATES_SQL, (1,)),
+    "report_timeline": (app.REPORT_TIMELINE_SQL, (1,)),
+}
+
+
+@pytest.mark.parametrize("name", HOT_QUERIES)
+def test_hot_query_never_scans(conn, name):
+    sql, params = HOT_QUERIES[name]
+    plan = [row["detail"] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+    scans = [step for step in plan if step.startswith("SCAN")]
+    assert not scans, f"{name} scans a table: {plan}"
@@ -0,0 +1,29 @@
+def add_update(conn, project_id, project_name, module_name, text):
+    conn.execute("INSERT INTO projects (id, name) VALUES (?, ?)", (project_id, project_name))
+    module_id = conn.execute("INSERT INTO modules (name, project_id) VALUES (?, ?)",
+                             (module_name, project_id)).lastrowid
+    conn.execute("INSERT INTO module_updates (module_id, update_date, update_text) VALUES (?, '2026-01-01', ?)",
+                 (module_id, text))
+    conn.commit()
+
+
+def search(client, **args):
+    response = client.get("/api/search", query_string=args)
+    assert response.status_code == 200
+    return response.get_json()["data"]
+
+
+def test_words_do_not_match_project_ids(conn, client):
+    add_update(conn, 150, "Schema Bug", "Login", "fixed the session timeout")
+    add_update(conn, 151, "Release 150", "Upload", "resized the thumbnails")
+
+    results = search(client, q="150")
+    assert [r["project_id"] for r in results] == [151]
+
+
+def test_project_scope(conn, client):
+    add_update(conn, 150, "Schema Bug", "Login", "fixed the session timeout")
+    add_update(conn, 151, "Release 150", "Upload", "fixed the thumbnails")
+
+    assert [r["project_id"] for r in search(client, q="fixed", project=150)] == [150]
+    assert search(client, q="fixed", project=-150) == []